@@ -0,0 +1,159 @@
+from settings import *
+from spatial import SpatialGrid, separation
+from multiprocessing import Process, Pipe, shared_memory
+
+# shared memory layout, all values are doubles
+HEADER_SIZE = 2  # player x, player y
+SPAWN_STRIDE = 4  # hitbox center x, center y, width, height per slot
+OUTPUT_STRIDE = 2  # hitbox center x, center y per slot
+
+def output_offset(capacity, tick):
+    # outputs are double buffered, even ticks write the first half and odd ticks the second
+    return HEADER_SIZE + capacity * SPAWN_STRIDE + (tick % 2) * capacity * OUTPUT_STRIDE
+
+def resolve(hitbox, colliders, dx, dy):
+    for rect in colliders:
+        if rect.colliderect(hitbox):
+            if dx > 0: hitbox.right = rect.left
+            if dx < 0: hitbox.left = rect.right
+            if dy < 0: hitbox.top = rect.bottom
+            if dy > 0: hitbox.bottom = rect.top
+
+def worker_main(memory_name, capacity, collider_rects, connection):
+    """Worker process loop: steer every enemy towards the player and resolve world collisions"""
+    memory = shared_memory.SharedMemory(name = memory_name)
+    data = memory.buf.cast('d')
+
+    # rects are unhashable, so the grid buckets their indices
+    colliders = [pygame.Rect(collider) for collider in collider_rects]
+    collision_grid = SpatialGrid()
+    for index, rect in enumerate(colliders):
+        collision_grid.insert_rect(index, rect)
+
+    hitboxes = {}
+    direction = pygame.Vector2()
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        tick, dt, spawned, removed = message
+
+        for slot in removed:
+            hitboxes.pop(slot, None)
+        for slot in spawned:
+            base = HEADER_SIZE + slot * SPAWN_STRIDE
+            hitbox = pygame.Rect(0, 0, data[base + 2], data[base + 3])
+            hitbox.center = (data[base], data[base + 1])
+            hitboxes[slot] = hitbox
+
+        # neighbours from the start of the tick, so the order enemies move in does not matter
+        neighbor_grid = SpatialGrid()
+        for slot, hitbox in hitboxes.items():
+            neighbor_grid.insert(slot, hitbox.centerx, hitbox.centery)
+
+        player_x, player_y = data[0], data[1]
+        out = output_offset(capacity, tick)
+        for slot, hitbox in hitboxes.items():
+            direction.update(player_x - hitbox.centerx, player_y - hitbox.centery)
+            if direction:
+                direction.normalize_ip()
+            push_x, push_y = separation(neighbor_grid, slot, hitbox.center)
+            if push_x or push_y:
+                direction.x += push_x * CROWD_SEPARATION_WEIGHT
+                direction.y += push_y * CROWD_SEPARATION_WEIGHT
+                if direction:
+                    direction.normalize_ip()
+            search_rect = hitbox.inflate(ENEMY_SPEED * dt * 2, ENEMY_SPEED * dt * 2)
+            nearby = [colliders[index] for index in collision_grid.query_rect(search_rect)]
+
+            hitbox.x += direction.x * ENEMY_SPEED * dt
+            resolve(hitbox, nearby, direction.x, 0)
+            hitbox.y += direction.y * ENEMY_SPEED * dt
+            resolve(hitbox, nearby, 0, direction.y)
+
+            data[out + slot * OUTPUT_STRIDE] = hitbox.centerx
+            data[out + slot * OUTPUT_STRIDE + 1] = hitbox.centery
+
+        connection.send(tick)
+
+    data.release()
+    memory.close()
+
+class EnemyAIWorker:
+    """Runs enemy steering in a separate process, exchanging positions through shared memory"""
+    def __init__(self, collision_sprites, capacity = ENEMY_AI_CAPACITY):
+        self.capacity = capacity
+        size = (HEADER_SIZE + capacity * (SPAWN_STRIDE + 2 * OUTPUT_STRIDE)) * 8
+        self.memory = shared_memory.SharedMemory(create = True, size = size)
+        self.data = self.memory.buf.cast('d')
+
+        collider_rects = [tuple(sprite.rect) for sprite in collision_sprites]
+        self.connection, worker_connection = Pipe()
+        self.process = Process(target = worker_main, args = (self.memory.name, capacity, collider_rects, worker_connection), daemon = True)
+        self.process.start()
+
+        # slot bookkeeping
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.enemies = {}
+        self.spawn_ticks = {}
+        self.new_slots = []
+        self.tick = 0
+        self.waiting = False
+
+    def attach(self, enemy):
+        """Hand an enemy to the worker, returns False when every slot is taken"""
+        if not self.free_slots:
+            return False
+        slot = self.free_slots.pop()
+        self.enemies[slot] = enemy
+        self.new_slots.append(slot)
+        enemy.remote = True
+        return True
+
+    def step(self, player_pos, dt):
+        """Collect the previous tick, start the next one and apply the collected positions"""
+        finished = self.connection.recv() if self.waiting else None
+        self.waiting = False
+        data = self.data
+
+        # the worker is idle now, so the spawn area can be written safely
+        removed = [slot for slot, enemy in self.enemies.items() if not enemy.alive()]
+        for slot in removed:
+            del self.enemies[slot]
+            self.spawn_ticks.pop(slot, None)
+            self.free_slots.append(slot)
+
+        self.tick += 1
+        spawned = [slot for slot in self.new_slots if slot in self.enemies]
+        for slot in spawned:
+            hitbox = self.enemies[slot].hitbox_rect
+            base = HEADER_SIZE + slot * SPAWN_STRIDE
+            data[base], data[base + 1] = hitbox.center
+            data[base + 2], data[base + 3] = hitbox.size
+            self.spawn_ticks[slot] = self.tick
+        self.new_slots.clear()
+
+        data[0], data[1] = player_pos
+        self.connection.send((self.tick, dt, spawned, removed))
+        self.waiting = True
+
+        # read the finished buffer while the worker writes the other one
+        if finished is not None:
+            out = output_offset(self.capacity, finished)
+            for slot, enemy in self.enemies.items():
+                spawn_tick = self.spawn_ticks.get(slot)
+                if spawn_tick is None or spawn_tick > finished:
+                    continue
+                center = (data[out + slot * OUTPUT_STRIDE], data[out + slot * OUTPUT_STRIDE + 1])
+                enemy.hitbox_rect.center = center
+                enemy.rect.center = center
+
+    def close(self):
+        if self.process.is_alive():
+            if self.waiting:
+                self.connection.recv()
+            self.connection.send(None)
+            self.process.join(1)
+        self.data.release()
+        self.memory.close()
+        self.memory.unlink()
@@ -0,0 +1,154 @@
+from settings import *
+
+# colors tried as the colorkey of surfaces with on/off alpha, the first one no visible pixel uses wins
+COLORKEY_CANDIDATES = ((255, 0, 255), (0, 255, 255), (1, 2, 3))
+
+def resource_path(relative_path):
+    try:
+        base_path = sys._MEIPASS  # PyInstaller temp folder
+    except AttributeError:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+class AssetManager:
+    """Loads every file once and hands out shared surfaces, derived variants are cached by key.
+    Surfaces stay cached until evict() drops them, nothing tracks who still holds one"""
+    def __init__(self):
+        self.surfaces = {}
+        self.fonts = {}
+
+        # per key bookkeeping: asset group and the key of a surface by its id
+        self.groups = {}
+        self.keys = {}
+
+        # group -> {format: count} of every surface that went through optimize()
+        self.formats = {}
+
+    def store(self, key, surface, group):
+        self.surfaces[key] = surface
+        self.groups[key] = group
+        self.keys[id(surface)] = key
+
+    def key_of(self, surface):
+        # surfaces that did not come from the manager are keyed by id, the cache keeps them alive
+        return self.keys.get(id(surface), ('external', id(surface)))
+
+    def image(self, path, alpha = True, group = 'misc', per_pixel = False):
+        """Load an image relative to the game folder, converted for the display.
+        per_pixel keeps full alpha for images that are rotated or smoothed at runtime, a colorkey would bleed"""
+        key = ('image', path, alpha, per_pixel)
+        if key not in self.surfaces:
+            surf = pygame.image.load(resource_path(path))
+            if not alpha:
+                surf = surf.convert()
+            elif per_pixel:
+                surf = surf.convert_alpha()
+            else:
+                surf = self.optimize(surf, group)
+            self.store(key, surf, group)
+        return self.surfaces[key]
+
+    def optimize(self, surface, group = 'misc'):
+        """Convert a surface to the cheapest blit format its alpha allows: opaque, colorkey with RLE or per-pixel alpha"""
+        width, height = surface.get_size()
+        colorkey, surface_alpha = surface.get_colorkey(), surface.get_alpha()
+        # pixels with alpha above 254 and above 0, masks of colorkeyed surfaces skip the key instead
+        solid = pygame.mask.from_surface(surface, 254).count()
+        visible = pygame.mask.from_surface(surface, 0).count()
+
+        converted, format = None, 'alpha'
+        if solid == width * height:
+            # no pixel shows the colorkey either, a key would only slow the blit down
+            converted, format = surface.convert(), 'opaque'
+            converted.set_colorkey(None)
+        elif colorkey is not None and solid == visible:
+            converted, format = surface.convert(), 'colorkey'
+            converted.set_colorkey(colorkey, pygame.RLEACCEL)
+        elif solid == visible:
+            converted = self.colorkeyed(surface, width * height - visible)
+            format = 'colorkey' if converted else 'alpha'
+        if converted is None:
+            converted = surface.convert_alpha()
+        elif surface_alpha is not None and surface_alpha < 255:
+            converted.set_alpha(surface_alpha, pygame.RLEACCEL)
+
+        counts = self.formats.setdefault(group, {})
+        counts[format] = counts.get(format, 0) + 1
+        return converted
+
+    def colorkeyed(self, surface, hidden):
+        """Opaque copy of an on/off alpha surface with the see-through pixels set to an unused colorkey"""
+        for key in COLORKEY_CANDIDATES:
+            keyed = pygame.Surface(surface.get_size()).convert()
+            keyed.fill(key)
+            keyed.blit(surface, (0, 0))
+            # the key must only show up where the surface was see-through
+            if pygame.mask.from_threshold(keyed, key, (1, 1, 1, 255)).count() == hidden:
+                keyed.set_colorkey(key, pygame.RLEACCEL)
+                return keyed
+        return None
+
+    def format_report(self):
+        """Blit formats chosen by optimize(), per asset group"""
+        return {group: dict(counts) for group, counts in self.formats.items()}
+
+    def frames(self, folder, group = 'misc'):
+        """Every png in a folder in numeric order, for frames named 0.png, 1.png ..."""
+        names = [name for name in os.listdir(resource_path(folder)) if name.endswith('.png')]
+        return [self.image(join(folder, name), group = group) for name in sorted(names, key = lambda name: int(name.split('.')[0]))]
+
+    def variant(self, kind, surface, params, make, group = None):
+        """Cached surface derived from another one, make(surface) builds it on the first request"""
+        source_key = self.key_of(surface)
+        key = (kind, source_key, params)
+        if key not in self.surfaces:
+            if source_key not in self.surfaces:
+                self.store(source_key, surface, group or 'misc')
+            group = group or self.groups[source_key]
+            self.store(key, self.optimize(make(surface), group), group)
+        return self.surfaces[key]
+
+    def scaled(self, surface, size, group = None):
+        return self.variant('scaled', surface, tuple(size), lambda surf: pygame.transform.scale(surf, size), group)
+
+    def flipped(self, surface, flip_x, flip_y, group = None):
+        return self.variant('flipped', surface, (flip_x, flip_y), lambda surf: pygame.transform.flip(surf, flip_x, flip_y), group)
+
+    def silhouette(self, surface, group = None):
+        """White mask of a surface with a black colorkey"""
+        def make(surf):
+            silhouette = pygame.mask.from_surface(surf).to_surface()
+            silhouette.set_colorkey('black')
+            return silhouette
+        return self.variant('silhouette', surface, None, make, group)
+
+    def faded(self, surface, alpha, group = None):
+        """Copy of a surface drawn at a fixed surface alpha"""
+        def make(surf):
+            faded = surf.copy()
+            faded.set_alpha(alpha)
+            return faded
+        return self.variant('faded', surface, alpha, make, group)
+
+    def font(self, path, size):
+        key = (path, size)
+        if key not in self.fonts:
+            self.fonts[key] = pygame.font.Font(resource_path(path), size)
+        return self.fonts[key]
+
+    def evict(self, group = None):
+        """Drop every cached surface of a group, or of all groups. The caller has to be done with them:
+        sprites still holding one keep drawing it, but the next request loads a fresh copy"""
+        for key in [key for key in self.surfaces if group in (None, self.groups[key])]:
+            del self.keys[id(self.surfaces[key])]
+            del self.surfaces[key], self.groups[key]
+
+    def memory_report(self):
+        """Surface count and pixel bytes per asset group"""
+        report = {}
+        for key, surface in self.surfaces.items():
+            count, size = report.get(self.groups[key], (0, 0))
+            report[self.groups[key]] = (count + 1, size + surface.get_width() * surface.get_height() * surface.get_bytesize())
+        return report
+
+assets = AssetManager()
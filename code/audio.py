@@ -0,0 +1,86 @@
+from settings import *
+
+class SoundScheduler:
+    """Plays sound effects on reserved channel groups with per-sound voice caps"""
+    def __init__(self, channel_groups=SFX_CHANNEL_GROUPS):
+        self.volume = 1.0
+        self.sounds = {}
+        self.groups = {}
+        self.steal_policy = {}
+
+        # voice bookkeeping: channel -> (sound name, start time, effective volume)
+        self.voices = {}
+        self.last_played = {}
+
+        if not pygame.mixer.get_init():
+            return
+
+        # reserve a contiguous block of channels per category, leave the rest for music
+        reserved = sum(count for count, _ in channel_groups.values())
+        pygame.mixer.set_num_channels(reserved + SFX_FREE_CHANNELS)
+        pygame.mixer.set_reserved(reserved)
+
+        index = 0
+        for group, (count, policy) in channel_groups.items():
+            self.groups[group] = [pygame.mixer.Channel(index + i) for i in range(count)]
+            self.steal_policy[group] = policy
+            index += count
+
+    def register(self, name, sound, group, base_volume, max_voices = 2, coalesce = SFX_COALESCE_WINDOW):
+        """Register a loaded sound under a name; missing sounds are ignored"""
+        if sound is None:
+            return
+        sound.set_volume(base_volume * self.volume)
+        self.sounds[name] = {
+            'sound': sound,
+            'group': group,
+            'base_volume': base_volume,
+            'max_voices': max_voices,
+            'coalesce': coalesce
+        }
+
+    def set_volume(self, volume):
+        """Apply the master sfx volume to every registered sound"""
+        self.volume = volume
+        for entry in self.sounds.values():
+            entry['sound'].set_volume(entry['base_volume'] * volume)
+
+    def play(self, name, volume = 1.0):
+        """Play a registered sound, returns the channel used or None if dropped"""
+        entry = self.sounds.get(name)
+        channels = self.groups.get(entry['group']) if entry else None
+        if not channels:
+            return None
+
+        # merge identical sounds triggered within the coalesce window
+        now = pygame.time.get_ticks()
+        if now - self.last_played.get(name, -entry['coalesce']) < entry['coalesce']:
+            return None
+
+        busy = [channel for channel in channels if channel.get_busy() and channel in self.voices]
+        same = [channel for channel in busy if self.voices[channel][0] == name]
+
+        if len(same) >= entry['max_voices']:
+            channel = self.steal(same, 'oldest')
+        else:
+            free = [channel for channel in channels if not channel.get_busy()]
+            channel = free[0] if free else self.steal(busy or channels, self.steal_policy[entry['group']])
+
+        channel.stop()
+        channel.set_volume(volume)
+        channel.play(entry['sound'])
+        self.voices[channel] = (name, now, entry['base_volume'] * volume)
+        self.last_played[name] = now
+        return channel
+
+    def steal(self, channels, policy):
+        """Pick the voice to cut: the oldest one or the quietest one"""
+        if policy == 'quietest':
+            return min(channels, key = lambda channel: self.voices.get(channel, (None, 0, 0))[2])
+        return min(channels, key = lambda channel: self.voices.get(channel, (None, 0, 0))[1])
+
+    def stop_all(self):
+        for channels in self.groups.values():
+            for channel in channels:
+                channel.stop()
+        self.voices.clear()
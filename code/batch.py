@@ -0,0 +1,162 @@
+import os
+
+# every instance runs without a window or sound card, set before pygame starts
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from settings import *
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import freeze_support
+from time import perf_counter
+import argparse, json, random
+
+# bot behaviour
+BOT_SIGHT_RADIUS = 700  # pixels, enemies further away are ignored
+BOT_KITE_RADIUS = 350  # pixels, enemies closer than this push the bot away
+BOT_STRAFE = 0.6  # share of sideways movement, keeps the bot circling instead of backing into walls
+
+# simulation step of a headless run, fixed so runs are comparable across machines, see run_game for the director
+BATCH_DT = 1 / 60
+
+class KiteBot:
+    """Stands in for keyboard and mouse: backs away from close enemies and shoots the nearest one"""
+    def __init__(self, game):
+        self.game = game
+        self.direction = pygame.Vector2()
+        self.aim = pygame.Vector2(0, 1)
+        self.fire = False
+        self.strafe = 1
+        self.last_pos = None
+
+    def update(self):
+        """Decide this frame's movement, aim and trigger from the enemy grid"""
+        player_pos = pygame.Vector2(self.game.player.rect.center)
+        enemies = self.game.enemy_grid.query_radius(player_pos, BOT_SIGHT_RADIUS)
+
+        # a bot that did not move last frame is pinned against a wall, circle the other way
+        if self.last_pos is not None and self.direction and player_pos.distance_squared_to(self.last_pos) < 1:
+            self.strafe = -self.strafe
+        self.last_pos = player_pos
+
+        nearest, nearest_distance = None, BOT_SIGHT_RADIUS
+        away = pygame.Vector2()
+        for enemy in enemies:
+            offset = player_pos - enemy.rect.center
+            distance = offset.length()
+            if distance < nearest_distance:
+                nearest, nearest_distance = enemy, distance
+            if 0 < distance < BOT_KITE_RADIUS:
+                # closer enemies push harder
+                away += offset / (distance * distance)
+
+        self.fire = nearest is not None and nearest_distance > 0
+        if self.fire:
+            self.aim = (pygame.Vector2(nearest.rect.center) - player_pos).normalize()
+
+        if away:
+            away = away.normalize()
+            self.direction = (away + away.rotate(90) * BOT_STRAFE * self.strafe).normalize()
+        else:
+            self.direction = pygame.Vector2()
+
+    def move_direction(self):
+        return pygame.Vector2(self.direction)
+
+    def aim_pos(self):
+        # the gun aims from the middle of the screen, like the mouse
+        return (WINDOW_WIDTH / 2 + self.aim.x * 100, WINDOW_HEIGHT / 2 + self.aim.y * 100)
+
+    def firing(self):
+        return self.fire
+
+def percentile(values, share):
+    """Value below which share of the sorted values fall"""
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+def run_game(seed, max_time):
+    """One headless game driven by the bot until game over or max_time seconds of play"""
+    from main import Game
+    from pacing import FramePacer
+
+    random.seed(seed)
+    game = Game()
+    game.pacer = FramePacer(game.clock, 'uncapped')
+    game.setup_game()
+    # the director would back off on this host's frame times, a fixed budget keeps runs reproducible
+    game.director.adaptive = False
+    game.game_state = 'playing'
+    bot = KiteBot(game)
+    game.player.controller = bot
+
+    frame_times = []
+    peak_enemies = 0
+    while game.game_state == 'playing' and game.timers.time < max_time * 1000:
+        start = perf_counter()
+        # no frame cap, the pacer only measures the frame work for the spawn director
+        game.pacer.wait()
+        game.poll_input()
+        bot.update()
+        game.handle_playing(BATCH_DT)
+        frame_times.append((perf_counter() - start) * 1000)
+        peak_enemies = max(peak_enemies, len(game.enemy_sprites))
+
+    game.stop_ai_worker()
+    if game.streamer:
+        game.streamer.close()
+    pygame.quit()
+
+    frame_times.sort()
+    return {
+        'seed': seed,
+        'survival_time': game.timers.time / 1000,
+        'survived': game.game_state == 'playing',
+        'score': game.score,
+        'peak_enemies': peak_enemies,
+        'frames': len(frame_times),
+        'frame_mean': sum(frame_times) / len(frame_times),
+        'frame_p50': percentile(frame_times, 0.5),
+        'frame_p95': percentile(frame_times, 0.95),
+        'frame_p99': percentile(frame_times, 0.99),
+        'frame_max': frame_times[-1]
+    }
+
+def summarize(results):
+    """Aggregate the per-run dictionaries into min, mean and max per statistic"""
+    summary = {'runs': len(results), 'survived': sum(result['survived'] for result in results)}
+    for name in ('survival_time', 'score', 'peak_enemies', 'frame_mean', 'frame_p95', 'frame_p99', 'frame_max'):
+        values = [result[name] for result in results]
+        summary[name] = {'min': min(values), 'mean': sum(values) / len(values), 'max': max(values)}
+    return summary
+
+def run_batch(runs, max_time, seed = 0, workers = None):
+    """Play runs games across a process pool, one fresh process per game"""
+    with ProcessPoolExecutor(max_workers = workers, max_tasks_per_child = 1) as executor:
+        futures = [executor.submit(run_game, seed + index, max_time) for index in range(runs)]
+        return [future.result() for future in futures]
+
+def print_report(results, summary):
+    print(f"{'seed':>6} {'time':>8} {'score':>6} {'peak':>5} {'mean ms':>8} {'p95 ms':>7} {'max ms':>7}")
+    for result in results:
+        print(f"{result['seed']:>6} {result['survival_time']:>8.1f} {result['score']:>6} {result['peak_enemies']:>5} "
+              f"{result['frame_mean']:>8.2f} {result['frame_p95']:>7.2f} {result['frame_max']:>7.2f}")
+    print(f"\n{summary['survived']} of {summary['runs']} runs survived")
+    for name, stats in summary.items():
+        if isinstance(stats, dict):
+            print(f"{name:>14}: min {stats['min']:.2f}  mean {stats['mean']:.2f}  max {stats['max']:.2f}")
+
+if __name__ == '__main__':
+    freeze_support()
+    parser = argparse.ArgumentParser(description = 'Play headless games with a bot and report survival and frame times')
+    parser.add_argument('--runs', type = int, default = os.cpu_count() or 1)
+    parser.add_argument('--workers', type = int, default = None, help = 'processes, defaults to every core')
+    parser.add_argument('--max-time', type = float, default = 300, help = 'seconds of play before a run is stopped')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the first run, later runs count up')
+    parser.add_argument('--json', help = 'also write the results and summary to this file')
+    args = parser.parse_args()
+
+    results = run_batch(args.runs, args.max_time, args.seed, args.workers)
+    summary = summarize(results)
+    print_report(results, summary)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'results': results, 'summary': summary}, file, indent = 2)
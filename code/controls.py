@@ -0,0 +1,104 @@
+from settings import *
+from collections import namedtuple
+import json
+
+# every other event type is dropped by SDL before it reaches the queue, mouse motion alone can flood it
+ALLOWED_EVENTS = [pygame.QUIT, pygame.WINDOWCLOSE, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN]
+
+MOVE_KEYS = {
+    'left': (pygame.K_LEFT, pygame.K_a),
+    'right': (pygame.K_RIGHT, pygame.K_d),
+    'up': (pygame.K_UP, pygame.K_w),
+    'down': (pygame.K_DOWN, pygame.K_s),
+}
+
+class InputSnapshot(namedtuple('InputSnapshot', 'tick move mouse held keys clicks quit')):
+    """One frame of input: move direction, mouse position in game coordinates, left button held,
+    keys and click positions since the last frame and whether the window was closed"""
+    __slots__ = ()
+
+    # same interface as batch.KiteBot and net.RemoteController
+    def move_direction(self):
+        return pygame.Vector2(self.move)
+
+    def aim_pos(self):
+        return self.mouse
+
+    def firing(self):
+        return self.held
+
+    def to_json(self):
+        return json.dumps(self)
+
+    @classmethod
+    def from_json(cls, line):
+        tick, move, mouse, held, keys, clicks, quit = json.loads(line)
+        return cls(tick, tuple(move), tuple(mouse), held, tuple(keys), tuple(tuple(click) for click in clicks), quit)
+
+# nothing pressed, the mouse resting below the middle of the screen
+IDLE_INPUT = InputSnapshot(0, (0, 0), (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 + 100), False, (), (), False)
+
+class InputLayer:
+    """Pumps the event queue once per frame and turns it into an InputSnapshot, the one place input is read"""
+    def __init__(self, to_game_pos, record_path = None, replay_path = None):
+        # maps window coordinates to game coordinates, they differ in fullscreen
+        self.to_game_pos = to_game_pos
+        self.tick = 0
+        self.snapshot = IDLE_INPUT
+
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(ALLOWED_EVENTS)
+
+        self.record_path = record_path or os.environ.get('OVERRUN_RECORD_INPUT', INPUT_RECORD_PATH)
+        self.recording = [] if self.record_path else None
+
+        replay_path = replay_path or os.environ.get('OVERRUN_REPLAY_INPUT', INPUT_REPLAY_PATH)
+        self.replay = []
+        if replay_path:
+            with open(replay_path) as file:
+                self.replay = [InputSnapshot.from_json(line) for line in file if line.strip()]
+            self.replay.reverse()
+
+    def read_live(self):
+        keys, clicks, quit = [], 0, False
+        for event in pygame.event.get():
+            if event.type in (pygame.QUIT, pygame.WINDOWCLOSE):
+                quit = True
+            elif event.type == pygame.KEYDOWN:
+                keys.append(event.key)
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                clicks += 1
+
+        # event positions are already in the renderer's logical coordinates when it has a logical size,
+        # the mouse position is always in window coordinates, so clicks use it like hover and aiming do
+        mouse = self.to_game_pos(pygame.mouse.get_pos())
+
+        pressed = pygame.key.get_pressed()
+        held = {name: any(pressed[key] for key in codes) for name, codes in MOVE_KEYS.items()}
+        move = pygame.Vector2(int(held['right']) - int(held['left']), int(held['down']) - int(held['up']))
+        if move:
+            move.normalize_ip()
+
+        return InputSnapshot(self.tick, (move.x, move.y), mouse,
+                             pygame.mouse.get_pressed()[0], tuple(keys), (mouse,) * clicks, quit)
+
+    def poll(self):
+        """Read this frame's input, recorded snapshots win over the live input until they run out"""
+        self.tick += 1
+        snapshot = self.read_live()
+        if self.replay:
+            # the queue is still drained, so the window stays responsive and can be closed
+            recorded = self.replay.pop()
+            snapshot = recorded._replace(quit = recorded.quit or snapshot.quit)
+
+        if self.recording is not None:
+            self.recording.append(snapshot)
+        self.snapshot = snapshot
+        return snapshot
+
+    def close(self):
+        """Write the recording, if one was made"""
+        if self.recording:
+            with open(self.record_path, 'w') as file:
+                file.writelines(snapshot.to_json() + '\n' for snapshot in self.recording)
+            print(f'Recorded {len(self.recording)} frames of input to {self.record_path}')
@@ -0,0 +1,57 @@
+from settings import *
+from random import choice
+
+class SpawnDirector:
+    """Sizes and places enemy waves from a difficulty curve, capped by an entity budget that shrinks under load"""
+    def __init__(self, spawn_positions, adaptive = True):
+        self.spawn_positions = spawn_positions
+        # False keeps the full budget whatever the frame time, for runs that must not depend on the host
+        self.adaptive = adaptive
+        self.reset()
+
+    def reset(self):
+        self.elapsed = 0
+        self.frame_time = DIRECTOR_TARGET_FRAME_TIME
+        self.budget_scale = 1.0
+
+    def difficulty(self):
+        """0 at the start of a run, 1 once the ramp time has passed"""
+        return min(1.0, self.elapsed / DIRECTOR_RAMP_TIME)
+
+    def wave_interval(self):
+        start, end = DIRECTOR_WAVE_INTERVAL
+        return start + (end - start) * self.difficulty()
+
+    def wave_size(self):
+        start, end = DIRECTOR_WAVE_SIZE
+        return round(start + (end - start) * self.difficulty())
+
+    def budget(self):
+        return int(DIRECTOR_ENTITY_BUDGET * self.budget_scale)
+
+    def observe(self, dt, frame_time):
+        """Feed one frame: dt of simulation time in seconds and the milliseconds the frame took to run"""
+        self.elapsed += dt * 1000
+        # smoothed so a single hitch does not stall the waves
+        self.frame_time += (frame_time - self.frame_time) * 0.1
+
+    def next_wave(self, live_count):
+        """Number of enemies to spawn now, adjusting the budget to the measured frame time first"""
+        # back off quickly when frames run long, recover slowly once they are cheap again
+        if self.adaptive:
+            if self.frame_time > DIRECTOR_TARGET_FRAME_TIME:
+                self.budget_scale = max(DIRECTOR_MIN_BUDGET_SCALE, self.budget_scale * 0.8)
+            else:
+                self.budget_scale = min(1.0, self.budget_scale + 0.05)
+        return max(0, min(self.wave_size(), self.budget() - live_count))
+
+    def spawn_point(self, camera_center):
+        """Random spawn position outside the viewport, the farthest one if every point is on screen"""
+        view_rect = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+        view_rect.center = camera_center
+        view_rect.inflate_ip(DIRECTOR_SPAWN_MARGIN * 2, DIRECTOR_SPAWN_MARGIN * 2)
+        hidden = [pos for pos in self.spawn_positions if not view_rect.collidepoint(pos)]
+        if hidden:
+            return choice(hidden)
+        x, y = camera_center
+        return max(self.spawn_positions, key = lambda pos: (pos[0] - x) ** 2 + (pos[1] - y) ** 2)
@@ -0,0 +1,86 @@
+from settings import *
+from array import array
+
+class EffectPool:
+    """Frame-based effects stored as parallel arrays and drawn with a single blits call"""
+    def __init__(self):
+        self.time = 0
+
+        # effect kinds: frames, milliseconds per frame and half size for culling
+        self.kind_ids = {}
+        self.kind_frames = []
+        self.kind_frame_duration = []
+        self.kind_half_size = []
+
+        # live effects, one entry per column
+        self.kind = array('H')
+        self.x = array('f')
+        self.y = array('f')
+        self.start = array('d')
+
+    def add_kind(self, name, frames, frame_duration):
+        """Register an effect type, frames should share one size"""
+        self.kind_ids[name] = len(self.kind_frames)
+        self.kind_frames.append(frames)
+        self.kind_frame_duration.append(frame_duration)
+        self.kind_half_size.append((frames[0].get_width() / 2, frames[0].get_height() / 2))
+
+    def has_kind(self, name):
+        return name in self.kind_ids
+
+    def spawn(self, name, pos):
+        """Start an effect centered on a world position"""
+        self.kind.append(self.kind_ids[name])
+        self.x.append(pos[0])
+        self.y.append(pos[1])
+        self.start.append(self.time)
+
+    def remove(self, index):
+        # swap the last effect into the hole so removal stays O(1)
+        last = len(self.kind) - 1
+        if index != last:
+            self.kind[index] = self.kind[last]
+            self.x[index] = self.x[last]
+            self.y[index] = self.y[last]
+            self.start[index] = self.start[last]
+        self.kind.pop()
+        self.x.pop()
+        self.y.pop()
+        self.start.pop()
+
+    def update(self, now):
+        """Advance to the given simulation time and drop finished effects"""
+        self.time = now
+        for index in range(len(self.kind) - 1, -1, -1):
+            kind = self.kind[index]
+            frame_index = int((now - self.start[index]) // self.kind_frame_duration[kind])
+            if frame_index >= len(self.kind_frames[kind]):
+                self.remove(index)
+
+    def draw(self, surface, offset):
+        """Blit every visible effect, skipping the ones outside the camera"""
+        offset_x, offset_y = int(offset[0]), int(offset[1])
+        width, height = surface.get_size()
+        now = self.time
+        blit_sequence = []
+
+        for index in range(len(self.kind)):
+            kind = self.kind[index]
+            half_width, half_height = self.kind_half_size[kind]
+            x = self.x[index] + offset_x - half_width
+            y = self.y[index] + offset_y - half_height
+            if x > width or y > height or x + 2 * half_width < 0 or y + 2 * half_height < 0:
+                continue
+
+            frames = self.kind_frames[kind]
+            frame_index = int((now - self.start[index]) // self.kind_frame_duration[kind])
+            blit_sequence.append((frames[min(frame_index, len(frames) - 1)], (x, y)))
+
+        if blit_sequence:
+            surface.blits(blit_sequence, doreturn = False)
+
+    def clear(self):
+        del self.kind[:], self.x[:], self.y[:], self.start[:]
+
+    def __len__(self):
+        return len(self.kind)
@@ -0,0 +1,85 @@
+from settings import *
+from array import array
+
+class Collider:
+    """Static world rectangle from the TMX Collisions layer, no image or group membership"""
+    __slots__ = ('rect',)
+
+    def __init__(self, rect):
+        self.rect = rect
+
+class BulletStore:
+    """Every live bullet as parallel arrays: position, velocity and expiry time"""
+    def __init__(self, image):
+        self.image = image
+        self.half_width, self.half_height = image.get_width() / 2, image.get_height() / 2
+
+        # components, the previous position is the start of this tick's swept path
+        self.x = array('d')
+        self.y = array('d')
+        self.previous_x = array('d')
+        self.previous_y = array('d')
+        self.velocity_x = array('d')
+        self.velocity_y = array('d')
+        self.expires = array('d')
+        # stable ids so snapshots can match bullets across ticks, see net.py
+        self.ids = array('I')
+        self.next_id = 0
+
+        # screen rects for drawing and collision, kept in sync with the arrays
+        self.rects = []
+
+    def spawn(self, pos, direction, now, speed = BULLET_SPEED, lifetime = BULLET_LIFETIME):
+        self.x.append(pos[0])
+        self.y.append(pos[1])
+        self.previous_x.append(pos[0])
+        self.previous_y.append(pos[1])
+        self.velocity_x.append(direction[0] * speed)
+        self.velocity_y.append(direction[1] * speed)
+        self.expires.append(now + lifetime)
+        self.ids.append(self.next_id)
+        self.next_id = (self.next_id + 1) & 0xFFFF
+        self.rects.append(self.image.get_rect(center = pos))
+
+    def columns(self):
+        return (self.x, self.y, self.previous_x, self.previous_y, self.velocity_x, self.velocity_y, self.expires, self.ids, self.rects)
+
+    def remove(self, index):
+        # swap the last bullet into the hole so removal stays O(1)
+        last = len(self.rects) - 1
+        for column in self.columns():
+            column[index] = column[last]
+            column.pop()
+
+    def update(self, dt, now):
+        """Move every bullet and drop the ones past their lifetime"""
+        x, y, rects = self.x, self.y, self.rects
+        previous_x, previous_y = self.previous_x, self.previous_y
+        velocity_x, velocity_y = self.velocity_x, self.velocity_y
+        for index in range(len(rects) - 1, -1, -1):
+            if self.expires[index] <= now:
+                self.remove(index)
+                continue
+            previous_x[index], previous_y[index] = x[index], y[index]
+            x[index] += velocity_x[index] * dt
+            y[index] += velocity_y[index] * dt
+            rects[index].center = (x[index], y[index])
+
+    def sweep_rect(self, index):
+        """Rect covering everything the bullet touched on its last move"""
+        x, y = self.x[index], self.y[index]
+        previous_x, previous_y = self.previous_x[index], self.previous_y[index]
+        left, top = min(x, previous_x) - self.half_width, min(y, previous_y) - self.half_height
+        return pygame.Rect(int(left), int(top),
+                           int(abs(x - previous_x) + 2 * self.half_width) + 2, int(abs(y - previous_y) + 2 * self.half_height) + 2)
+
+    def draw_items(self):
+        """(image, rect) pairs for the camera group"""
+        return [(self.image, rect) for rect in self.rects]
+
+    def clear(self):
+        for column in self.columns():
+            del column[:]
+
+    def __len__(self):
+        return len(self.rects)
@@ -1,25 +1,162 @@
-from settings import * 
+from settings import *
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left, bisect_right
+from heapq import merge
+
+# tile copies kept per render thread before its cache starts over, bounds memory on streamed maps
+STRIP_IMAGE_LIMIT = 4096
 
 class AllSprites(pygame.sprite.Group):
     def __init__(self, display_surface=None):
         super().__init__()
         self.display_surface = display_surface
         self.offset = pygame.Vector2()
-    
+
+        # draw order: static layers stay sorted by centery, moving sprites are re-sorted each frame
+        self.ground_sprites, self.ground_keys = [], []
+        self.static_sprites, self.static_keys = [], []
+        self.dynamic_sprites = []
+        self.static_margin = 0
+
+        # array-backed entity stores drawn through draw_items() instead of sprites
+        self.sources = []
+
+        # threaded ground rendering, one horizontal strip of the screen per task, each with its own tile copies
+        self.render_pool = ThreadPoolExecutor(RENDER_THREADS) if RENDER_THREADS > 1 else None
+        self.strips = []
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        if hasattr(sprite, 'ground'):
+            self.insert_sorted(self.ground_sprites, self.ground_keys, sprite)
+        elif hasattr(sprite, 'static'):
+            self.insert_sorted(self.static_sprites, self.static_keys, sprite)
+        else:
+            self.dynamic_sprites.append(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        if hasattr(sprite, 'ground'):
+            self.remove_sorted(self.ground_sprites, self.ground_keys, sprite)
+        elif hasattr(sprite, 'static'):
+            self.remove_sorted(self.static_sprites, self.static_keys, sprite)
+        else:
+            self.dynamic_sprites.remove(sprite)
+
+    def insert_sorted(self, sprites, keys, sprite):
+        index = bisect_right(keys, sprite.rect.centery)
+        keys.insert(index, sprite.rect.centery)
+        sprites.insert(index, sprite)
+        # tallest static sprite, used to widen the visible range when culling by centery
+        self.static_margin = max(self.static_margin, sprite.rect.height)
+
+    def remove_sorted(self, sprites, keys, sprite):
+        # only sprites sharing the key need a look, a row of tiles shares one
+        start = bisect_left(keys, sprite.rect.centery)
+        end = bisect_right(keys, sprite.rect.centery, start)
+        for index in range(start, end):
+            if sprites[index] is sprite:
+                break
+        else:
+            # the sprite moved after it was inserted
+            index = sprites.index(sprite)
+        del sprites[index]
+        del keys[index]
+
+    def visible(self, sprites, keys, view_rect):
+        """Static sprites overlapping the view, found by bisecting their sorted centery keys"""
+        start = bisect_left(keys, view_rect.top - self.static_margin)
+        end = bisect_right(keys, view_rect.bottom + self.static_margin)
+        left, right = view_rect.left, view_rect.right
+        return [sprite for sprite in sprites[start:end] if sprite.rect.right > left and sprite.rect.left < right]
+
+    def add_source(self, source):
+        """Register a store whose draw_items() are Y-sorted together with the sprites"""
+        self.sources.append(source)
+
     def set_display_surface(self, surface):
         """Update the display surface reference"""
         self.display_surface = surface
-    
-    def draw(self, target_pos):
+        self.strips = []
+
+    def build_strips(self):
+        """Split the display surface into horizontal subsurfaces, one per render thread"""
+        width, height = self.display_surface.get_size()
+        strip_height = -(-height // RENDER_THREADS)
+        self.strips = []
+        for top in range(0, height, strip_height):
+            rect = pygame.Rect(0, top, width, min(strip_height, height - top))
+            # id(tile image) -> (image, copy), holding the image keeps its id unique
+            self.strips.append((rect, self.display_surface.subsurface(rect), {}))
+
+    def strip_image(self, images, image):
+        """This strip's copy of a tile image. SDL remaps a source surface whenever it is blitted to another
+        destination, so two threads must never blit the same source. Copies are made on the main thread"""
+        entry = images.get(id(image))
+        if entry is None:
+            if len(images) >= STRIP_IMAGE_LIMIT:
+                images.clear()
+            entry = images[id(image)] = (image, image.copy())
+        return entry[1]
+
+    def draw_batch(self, surface, sprites, offset_x, offset_y):
+        """Submit sprites as one blits call with precomputed screen positions"""
+        surface.blits([(sprite.image, (sprite.rect.x + offset_x, sprite.rect.y + offset_y)) for sprite in sprites], doreturn = False)
+
+    def draw_ground(self, ground_sprites, offset_x, offset_y):
+        """Compose the ground layer in parallel, returns once every strip is finished"""
+        if not self.strips:
+            self.build_strips()
+
+        # ground_sprites is sorted by centery, so every strip only looks at a bisected slice
+        keys = [sprite.rect.centery for sprite in ground_sprites]
+        tasks = []
+        for strip_rect, strip_surface, images in self.strips:
+            top, bottom = strip_rect.top - offset_y, strip_rect.bottom - offset_y
+            start = bisect_left(keys, top - self.static_margin)
+            end = bisect_right(keys, bottom + self.static_margin)
+            # strip-local coordinates, anything outside the strip is clipped by the subsurface
+            blit_sequence = [(self.strip_image(images, sprite.image), (sprite.rect.x + offset_x, sprite.rect.y + offset_y - strip_rect.top))
+                             for sprite in ground_sprites[start:end] if sprite.rect.bottom > top and sprite.rect.top < bottom]
+            tasks.append(self.render_pool.submit(strip_surface.blits, blit_sequence, False))
+        for task in tasks:
+            task.result()
+
+    def draw(self, target_pos, renderer = None):
+        """Draw the world centered on target_pos, onto the display surface or through a TextureRenderer"""
         if self.display_surface is None:
             self.display_surface = pygame.display.get_surface()
-            
+
         self.offset.x = -(target_pos[0] - WINDOW_WIDTH / 2)
         self.offset.y = -(target_pos[1] - WINDOW_HEIGHT / 2)
 
-        ground_sprites = [sprite for sprite in self if hasattr(sprite, 'ground')] 
-        object_sprites = [sprite for sprite in self if not hasattr(sprite, 'ground')] 
-        
-        for layer in [ground_sprites, object_sprites]:
-            for sprite in sorted(layer, key = lambda sprite: sprite.rect.centery):
-                self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset)
\ No newline at end of file
+        # integer camera offset, computed once and shared by every blit this frame
+        offset_x, offset_y = int(self.offset.x), int(self.offset.y)
+        view_rect = pygame.Rect(-offset_x, -offset_y, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+        # moving sprites are nearly sorted from the last frame, which timsort handles in linear time
+        self.dynamic_sprites.sort(key = lambda sprite: sprite.rect.centery)
+        ground_sprites = self.visible(self.ground_sprites, self.ground_keys, view_rect)
+        object_sprites = merge(self.visible(self.static_sprites, self.static_keys, view_rect), self.dynamic_sprites,
+                               key = lambda sprite: sprite.rect.centery)
+        if renderer:
+            # the renderer needs the sprite too, for rotation
+            object_items = ((sprite.image, sprite.rect, sprite) for sprite in object_sprites)
+        else:
+            object_items = ((sprite.image, sprite.rect) for sprite in object_sprites)
+        for source in self.sources:
+            source_items = sorted(source.draw_items(), key = lambda item: item[1].centery)
+            if renderer:
+                source_items = [(image, rect, None) for image, rect in source_items]
+            object_items = merge(object_items, source_items, key = lambda item: item[1].centery)
+
+        if renderer:
+            self.draw_batch(renderer, ground_sprites, offset_x, offset_y)
+            renderer.draw_items(object_items, offset_x, offset_y)
+            return
+
+        if self.render_pool:
+            self.draw_ground(ground_sprites, offset_x, offset_y)
+        else:
+            self.draw_batch(self.display_surface, ground_sprites, offset_x, offset_y)
+        self.display_surface.blits([(image, (rect.x + offset_x, rect.y + offset_y)) for image, rect in object_items], doreturn = False)
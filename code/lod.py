@@ -0,0 +1,29 @@
+from settings import *
+
+class SimulationLOD:
+    """Sorts enemies into update tiers by their distance from the viewport"""
+    def __init__(self):
+        self.tick = 0
+        self.counts = [0] * len(LOD_UPDATE_INTERVALS)
+
+    def assign(self, sprites, camera_center):
+        """Set lod_tier and lod_due on every sprite for this tick"""
+        self.tick += 1
+        view_rect = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+        view_rect.center = camera_center
+        near_rect = view_rect.inflate(LOD_NEAR_MARGIN * 2, LOD_NEAR_MARGIN * 2)
+        far_rect = view_rect.inflate(LOD_FAR_MARGIN * 2, LOD_FAR_MARGIN * 2)
+
+        counts = [0] * len(LOD_UPDATE_INTERVALS)
+        for sprite in sprites:
+            if near_rect.colliderect(sprite.rect):
+                tier = 0
+            elif far_rect.colliderect(sprite.rect):
+                tier = 1
+            else:
+                tier = 2
+            sprite.lod_tier = tier
+            # the per-sprite phase spreads reduced-rate updates evenly across ticks
+            sprite.lod_due = (self.tick + sprite.lod_phase) % LOD_UPDATE_INTERVALS[tier] == 0
+            counts[tier] += 1
+        self.counts = counts
@@ -1,36 +1,69 @@
+from startup import startup
 from settings import *
 from player import Player
 from sprites import *
-from pytmx.util_pygame import load_pygame
 from groups import AllSprites
 from menu import Menu
+from audio import SoundScheduler
+from timers import TimerQueue
+from effects import EffectPool
+from spatial import SpatialGrid, segment_entry
+from director import SpawnDirector
+from lod import SimulationLOD
+from ai_worker import EnemyAIWorker
+from entities import Collider, BulletStore
+from tilegrid import TileGrid
+from streaming import WorldStreamer, is_infinite
+from assets import assets, resource_path
+from render import create_renderer
+from controls import InputLayer, IDLE_INPUT
+from pacing import FramePacer
 
 from random import randint, choice
 from os import listdir
-
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS  # PyInstaller temp folder
-    except AttributeError:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+from multiprocessing import freeze_support
 
 class Game:
     def __init__(self):
         # setup
-        pygame.init()
+        startup.mark('imports')
+        self.fast_start = FAST_START and os.environ.get('OVERRUN_FAST_START', '1') != '0'
+        if self.fast_start:
+            self.init_pygame_fast()
+        else:
+            pygame.init()
 
-        pygame.display.set_icon(pygame.image.load(resource_path("images/ui/overrun_icon.png")))
+        icon = pygame.image.load(resource_path("images/ui/overrun_icon.png"))
+        pygame.display.set_icon(icon)
         
         # Fullscreen management
         self.is_fullscreen = False
+        # a SCALED window goes fullscreen and maps the mouse by itself, is_fullscreen stays False for it
+        self.sdl_scaled = False
         self.windowed_size = (WINDOW_WIDTH, WINDOW_HEIGHT)
-        self.display_surface = pygame.display.set_mode(self.windowed_size)
-        self.screen = self.display_surface  
+
+        # frame limiter, decides whether the window is created with vsync
+        self.clock = pygame.time.Clock()
+        self.pacer = FramePacer(self.clock)
+        vsync = self.pacer.mode == 'vsync'
+
+        # texture backend: gameplay is drawn by the renderer, menus still go to an offscreen surface
+        self.renderer = create_renderer('OVERRUN', self.windowed_size, icon, vsync)
+        if self.renderer:
+            self.display_surface = pygame.Surface(self.windowed_size)
+            self.screen = None
+            Gun.rotate_image = False
+        else:
+            self.display_surface = self.create_window(vsync)
+            self.screen = self.display_surface  
         
         pygame.display.set_caption('OVERRUN')
-        self.clock = pygame.time.Clock()
         self.running = True
+
+        # input is read once per frame, every state and system works from the same snapshot
+        self.input_layer = InputLayer(self.to_game_pos)
+        self.snapshot = IDLE_INPUT
+        startup.mark('display')
         
         # Scaling variables
         self.scale = 1.0
@@ -43,28 +76,102 @@ class Game:
         
         # Menu
         self.menu = Menu(self.display_surface)
+        startup.mark('menu')
         
-        # Load images and audio first
-        self.load_images()
-        self.load_audio()
+        # a fast start loads sound and the loading screen after the first menu frame and gameplay images in setup_game
+        self.sfx = SoundScheduler()
+        self.menu_music = self.game_music = self.current_music = None
+        self.loading_frames = []
+        self.audio_loaded = False
+        self.bullet_surf = None
+        if not self.fast_start:
+            self.load_images()
+            startup.mark('gameplay images')
+            self.load_deferred()
         
         # Loading screen
-        self.loading_frames = []
-        self.load_loading_animation()
         self.loading_start_time = 0
         self.loading_target_state = None
         
         # Game variables (initialized in setup)
         self.all_sprites = None
         self.collision_sprites = None
-        self.bullet_sprites = None
+        self.bullets = None
         self.enemy_sprites = None
         self.player = None
         self.gun = None
+        self.ai_worker = None
+        self.streamer = None
+        self.score_text = None
+
+    def init_pygame_fast(self):
+        """Start only what the menu needs, the mixer is opened by load_deferred"""
+        pygame.display.init()
+        pygame.font.init()
+        try:
+            # pygame.init() would start the timer that get_ticks reads, along with every other subsystem
+            from pygame._sdl2 import sdl2
+            sdl2.init_subsystem(sdl2.INIT_TIMER)
+        except (ImportError, AttributeError):
+            pygame.init()
+
+    def load_deferred(self):
+        """Sound and the loading animation, once"""
+        if self.audio_loaded:
+            return
+        self.audio_loaded = True
+        if not pygame.mixer.get_init():
+            try:
+                pygame.mixer.init()
+            except pygame.error as error:
+                print(f"Warning: audio unavailable: {error}")
+        self.load_audio()
+        startup.mark('audio')
+        self.load_loading_animation()
+        startup.mark('loading animation')
+
+    def finish_startup(self):
+        """Called once the first frame is on screen: log the launch and load what a fast start left out"""
+        startup.mark('first frame')
+        if STARTUP_LOG:
+            startup.report('menu shown', STARTUP_TARGET_TIME)
+        if not self.audio_loaded:
+            self.load_deferred()
+            if STARTUP_LOG:
+                startup.report('deferred assets loaded')
+            self.pacer.restart()
+
+    def create_window(self, vsync):
+        """Display surface for the surface backend, SDL only offers vsync to SCALED windows"""
+        if vsync:
+            try:
+                window = pygame.display.set_mode(self.windowed_size, pygame.SCALED, vsync = 1)
+                self.sdl_scaled = True
+                return window
+            except pygame.error as error:
+                print(f"Warning: vsync unavailable ({error}), using the hybrid frame limiter")
+                self.pacer.mode = 'hybrid'
+        return pygame.display.set_mode(self.windowed_size)
 
     def toggle_fullscreen(self):
         """Toggle between windowed and fullscreen mode"""
+        if self.sdl_scaled:
+            # set_mode would drop the vsync, SDL scales the window instead of render_to_screen
+            pygame.display.toggle_fullscreen()
+            return
+
         self.is_fullscreen = not self.is_fullscreen
+
+        if self.renderer:
+            # the renderer scales to the window, only the mouse mapping has to follow
+            screen_width, screen_height = self.renderer.set_fullscreen(self.is_fullscreen)
+            if self.is_fullscreen:
+                self.scale = min(screen_width / WINDOW_WIDTH, screen_height / WINDOW_HEIGHT)
+                self.offset_x = (screen_width - WINDOW_WIDTH * self.scale) / 2
+                self.offset_y = (screen_height - WINDOW_HEIGHT * self.scale) / 2
+            else:
+                self.scale, self.offset_x, self.offset_y = 1.0, 0, 0
+            return
         
         if self.is_fullscreen:
             # Switch to fullscreen mode
@@ -100,9 +207,9 @@ class Game:
         if self.all_sprites:
             self.all_sprites.set_display_surface(self.display_surface)
     
-    def get_scaled_mouse_pos(self):
-        """Get mouse position scaled to game coordinates"""
-        mouse_x, mouse_y = pygame.mouse.get_pos()
+    def to_game_pos(self, pos):
+        """Scale a window position, like the mouse's, to game coordinates"""
+        mouse_x, mouse_y = pos
         
         if self.is_fullscreen:
             # Unscale and un-offset mouse position
@@ -119,7 +226,10 @@ class Game:
     
     def render_to_screen(self):
         """Render the game surface to the actual screen with proper scaling"""
-        if self.is_fullscreen:
+        if self.renderer:
+            self.renderer.present(self.display_surface)
+            return
+        if self.is_fullscreen and self.screen is not self.display_surface:
             # Fill screen with black
             self.screen.fill((0, 0, 0))
             
@@ -169,6 +279,14 @@ class Game:
             print("Warning: button_click.wav not found")
             self.button_click_sound = None
         
+        # Sound effect channels
+        self.sfx = SoundScheduler()
+        self.sfx.register('shoot', self.shoot_sound, 'weapon', 0.2, max_voices = 3)
+        self.sfx.register('impact', self.impact_sound, 'impact', 0.3, max_voices = 3)
+        self.sfx.register('player_death', self.player_death_sound, 'player', 0.4, max_voices = 1)
+        self.sfx.register('player_revive', self.player_revive_sound, 'player', 0.3, max_voices = 1)
+        self.sfx.register('button_click', self.button_click_sound, 'ui', 0.3)
+        
         # Background music
         try:
             self.menu_music = pygame.mixer.Sound(resource_path(AUDIO_MENU_MUSIC))
@@ -187,21 +305,21 @@ class Game:
         self.current_music = None
 
     def load_images(self):
-        self.bullet_surf = pygame.image.load(resource_path(join('images', 'gun', 'bullet.png'))).convert_alpha()
+        self.bullet_surf = assets.image(join('images', 'gun', 'bullet.png'), group = 'player')
         
         # Load heart images for health display
         try:
             # Load full heart
-            heart_dir = resource_path(join('images', 'ui', 'heart'))
-            heart_files = [f for f in listdir(heart_dir) if f.endswith('.png')]
+            heart_dir = join('images', 'ui', 'heart')
+            heart_files = [f for f in listdir(resource_path(heart_dir)) if f.endswith('.png')]
             if len(heart_files) >= 2:
                 # Assuming first is full, second is empty (or sort them)
                 heart_files.sort()
-                self.heart_full_surf = pygame.image.load(join(heart_dir, heart_files[0])).convert_alpha()
-                self.heart_empty_surf = pygame.image.load(join(heart_dir, heart_files[1])).convert_alpha()
+                self.heart_full_surf = assets.image(join(heart_dir, heart_files[0]), group = 'ui')
+                self.heart_empty_surf = assets.image(join(heart_dir, heart_files[1]), group = 'ui')
                 # Scale them
-                self.heart_full_surf = pygame.transform.scale(self.heart_full_surf, (40, 40))
-                self.heart_empty_surf = pygame.transform.scale(self.heart_empty_surf, (40, 40))
+                self.heart_full_surf = assets.scaled(self.heart_full_surf, (40, 40))
+                self.heart_empty_surf = assets.scaled(self.heart_empty_surf, (40, 40))
             else:
                 raise Exception("Need 2 heart images")
         except Exception as e:
@@ -217,41 +335,37 @@ class Game:
             pygame.draw.circle(self.heart_empty_surf, (100, 100, 100), (15, 15), 12, 2)
             pygame.draw.circle(self.heart_empty_surf, (100, 100, 100), (25, 15), 12, 2)
             pygame.draw.polygon(self.heart_empty_surf, (100, 100, 100), [(8, 18), (20, 35), (32, 18)], 2)
+            self.heart_full_surf = assets.optimize(self.heart_full_surf, 'ui')
+            self.heart_empty_surf = assets.optimize(self.heart_empty_surf, 'ui')
         
         # Load death effect frames
         self.death_effect_frames = []
         try:
-            death_effect_path = resource_path(join('images', 'ui', 'death'))
-            death_files = sorted([f for f in listdir(death_effect_path) if f.endswith('.png')])
+            death_effect_path = join('images', 'ui', 'death')
+            death_files = sorted([f for f in listdir(resource_path(death_effect_path)) if f.endswith('.png')])
             for file in death_files:
-                surf = pygame.image.load(join(death_effect_path, file)).convert_alpha()
+                surf = assets.image(join(death_effect_path, file), group = 'effects')
                 # Scale to a reasonable size for the effect
-                surf = pygame.transform.scale(surf, (144, 144))
+                surf = assets.scaled(surf, (144, 144))
                 self.death_effect_frames.append(surf)
             print(f"Loaded {len(self.death_effect_frames)} death effect frames")
         except Exception as e:
             print(f"Warning: Death effect images not found: {e}")
 
-        enemies_path = resource_path(join('images', 'enemies'))
-        folders = list(walk(enemies_path))[0][1]
+        enemies_path = join('images', 'enemies')
+        folders = list(walk(resource_path(enemies_path)))[0][1]
         self.enemy_frames = {}
         for folder in folders:
-            for folder_path, _, file_names in walk(join(enemies_path, folder)):
-                self.enemy_frames[folder] = []
-                for file_name in sorted(file_names, key = lambda name: int(name.split('.')[0])):
-                    full_path = join(folder_path, file_name)
-                    surf = pygame.image.load(full_path).convert_alpha()
-                    self.enemy_frames[folder].append(surf)
+            self.enemy_frames[folder] = assets.frames(join(enemies_path, folder), 'enemies')
     
     def load_loading_animation(self):
         """Load loading animation frames"""
         try:
-            loading_path = resource_path(LOADING_ANIMATION_PATH)
-            loading_files = sorted([f for f in listdir(loading_path) if f.endswith('.png')])
+            loading_files = sorted([f for f in listdir(resource_path(LOADING_ANIMATION_PATH)) if f.endswith('.png')])
             for file in loading_files:
-                surf = pygame.image.load(join(loading_path, file)).convert_alpha()
+                surf = assets.image(join(LOADING_ANIMATION_PATH, file), group = 'ui')
                 # Scale to reasonable size (e.g., 128x128)
-                surf = pygame.transform.scale(surf, (240, 128))
+                surf = assets.scaled(surf, (240, 128))
                 self.loading_frames.append(surf)
             print(f"Loaded {len(self.loading_frames)} loading animation frames")
         except Exception as e:
@@ -261,99 +375,181 @@ class Game:
                 surf = pygame.Surface((128, 128), pygame.SRCALPHA)
                 angle = i * 45
                 pygame.draw.arc(surf, (225,225,225), (20, 20, 88, 88), 0, 3.14 * angle / 180, 10)
-                self.loading_frames.append(surf)
+                self.loading_frames.append(assets.optimize(surf, 'ui'))
 
     def setup_game(self):
-        """Initialize/reset the game"""
-        # groups 
-        self.all_sprites = AllSprites(self.display_surface)
-        self.collision_sprites = pygame.sprite.Group()
-        self.bullet_sprites = pygame.sprite.Group()
-        self.enemy_sprites = pygame.sprite.Group()
+        """Initialize the game, the world is only built once and reused by later restarts"""
+        if self.all_sprites is None:
+            if self.bullet_surf is None:
+                self.load_images()
+
+            # groups 
+            self.all_sprites = AllSprites(self.display_surface)
+            self.collision_sprites = []
+            self.bullets = BulletStore(self.bullet_surf)
+            self.all_sprites.add_source(self.bullets)
+            self.enemy_sprites = pygame.sprite.Group()
+            self.enemy_grid = SpatialGrid()
+            self.collision_grid = SpatialGrid()
+
+            # enemy waves
+            self.spawn_positions = []
+            self.director = SpawnDirector(self.spawn_positions)
+
+            # Death effect and enemy death flashes
+            self.effects = EffectPool()
+            if self.death_effect_frames:
+                self.effects.add_kind('player_death', self.death_effect_frames, 50)  # 50 milliseconds per frame
+            for kind, frames in self.enemy_frames.items():
+                death_frames = self.enemy_death_frames(frames[0])
+                self.effects.add_kind(f'{kind}_death', death_frames, ENEMY_DEATH_DURATION / len(death_frames))
+
+            # Load map and entities
+            self.setup()
+            print(f"Surface formats: {assets.format_report()}")
+
+        self.reset_game()
+
+    def enemy_death_frames(self, surface):
+        """Silhouette flash then fading copies, shared by every enemy of a type"""
+        silhouette = assets.silhouette(surface, group = 'effects')
+        count = max(1, ENEMY_DEATH_FADE_FRAMES)
+        return [assets.faded(silhouette, round(255 * (count - index) / count)) for index in range(count)]
+
+    def reset_game(self):
+        """Reset the dynamic state only: entities, effects, timers, score and lives"""
+        for enemy in self.enemy_sprites.sprites():
+            enemy.kill()
+        self.bullets.clear()
+        self.effects.clear()
+        self.lod = SimulationLOD()
+
+        # simulation clock, only advances while playing
+        self.timers = TimerQueue()
 
         # gun timer
         self.can_shoot = True
-        self.shoot_time = 0 
         self.gun_cooldown = GUN_COOLDOWN
 
-        # enemy timer 
-        self.enemy_event = pygame.event.custom_type()
-        pygame.time.set_timer(self.enemy_event, ENEMY_SPAWN_RATE)
-        self.spawn_positions = []
-        
+        # enemy waves
+        self.director.reset()
+        self.timers.schedule(self.director.wave_interval(), self.spawn_wave)
+
         # Player health
         self.player_lives = PLAYER_MAX_LIVES
         self.invulnerable = False
-        self.hit_time = 0
         self.invulnerability_duration = INVULNERABILITY_DURATION
-        
-        # Death effect
-        self.death_effects = []  # List to store active death effects
-        
+
         # Score
         self.score = 0
-        
-        # Load map and entities
-        self.setup()
+
+        # back to the spawn point
+        self.player.rect.center = self.player_spawn
+        self.player.hitbox_rect.center = self.player_spawn
+        self.player.direction.update(0, 0)
+        self.gun.rect.center = self.player.rect.center + self.gun.player_direction * self.gun.distance
+        if self.streamer:
+            self.streamer.update(self.player_spawn, block = True)
 
     def input(self):
-        if pygame.mouse.get_pressed()[0] and self.can_shoot:
-            if self.shoot_sound:
-                self.shoot_sound.play()
+        if self.player.controls.firing() and self.can_shoot:
+            self.sfx.play('shoot')
             pos = self.gun.rect.center + self.gun.player_direction * 50
-            Bullet(self.bullet_surf, pos, self.gun.player_direction, (self.all_sprites, self.bullet_sprites))
+            self.bullets.spawn(pos, self.gun.player_direction, self.timers.time)
             self.can_shoot = False
-            self.shoot_time = pygame.time.get_ticks()
+            self.timers.schedule(self.gun_cooldown, self.gun_timer)
 
     def gun_timer(self):
-        if not self.can_shoot:
-            current_time = pygame.time.get_ticks()
-            if current_time - self.shoot_time >= self.gun_cooldown:
-                self.can_shoot = True
+        self.can_shoot = True
 
     def setup(self):
-        map = load_pygame(resource_path(join('data', 'maps', 'world.tmx')))
+        map_path = resource_path(MAP_PATH)
+        if WORLD_STREAMING or is_infinite(map_path):
+            # tiles and objects are loaded around the player as it moves, see reset_game
+            self.streamer = WorldStreamer(map_path, self.all_sprites, self.collision_sprites, self.collision_grid)
+            self.tile_grid = None
+            self.setup_entities(self.streamer.source.objects.get('Entities', []))
+            return
+
+        # pytmx is only needed here, leaving it out of the imports shortens the launch
+        from pytmx.util_pygame import load_pygame
+        map = load_pygame(map_path)
+        # pytmx hands out per-pixel alpha subsurfaces, most tiles are fully opaque
+        map.images = [assets.optimize(image, 'tiles') if image else image for image in map.images]
 
         for x, y, image in map.get_layer_by_name('Ground').tiles():
             Sprite((x * TILE_SIZE,y * TILE_SIZE), image, self.all_sprites)
         
         for obj in map.get_layer_by_name('Objects'):
-            CollisionSprite((obj.x, obj.y), obj.image, (self.all_sprites, self.collision_sprites))
+            self.collision_sprites.append(CollisionSprite((obj.x, obj.y), obj.image, self.all_sprites))
         
         for obj in map.get_layer_by_name('Collisions'):
-            CollisionSprite((obj.x, obj.y), pygame.Surface((obj.width, obj.height)), self.collision_sprites)
+            self.collision_sprites.append(Collider(pygame.Rect(obj.x, obj.y, obj.width, obj.height)))
+
+        for sprite in self.collision_sprites:
+            self.collision_grid.insert_rect(sprite, sprite.rect)
+        self.tile_grid = TileGrid.from_tmx(map, self.collision_sprites)
+        self.tile_grid.track_occupancy(self.enemy_sprites)
+
+        if ENEMY_AI_WORKER:
+            self.ai_worker = EnemyAIWorker(self.collision_sprites)
 
-        for obj in map.get_layer_by_name('Entities'):
+        self.setup_entities(map.get_layer_by_name('Entities'))
+
+    def setup_entities(self, objects):
+        for obj in objects:
             if obj.name == 'Player':
+                self.player_spawn = (obj.x, obj.y)
                 self.player = Player((obj.x,obj.y), self.all_sprites, self.collision_sprites)
                 self.gun = Gun(self.player, self.all_sprites)
             else:
                 self.spawn_positions.append((obj.x, obj.y))
 
+    def stop_ai_worker(self):
+        if self.ai_worker:
+            self.ai_worker.close()
+            self.ai_worker = None
+
     def bullet_collision(self):
-        if self.bullet_sprites:
-            for bullet in self.bullet_sprites:
-                collision_sprites = pygame.sprite.spritecollide(bullet, self.enemy_sprites, False, pygame.sprite.collide_mask)
-                if collision_sprites:
-                    if self.impact_sound:
-                        self.impact_sound.play()
-                    for sprite in collision_sprites:
-                        # Check if enemy is not already in death animation
-                        if sprite.death_time == 0:
-                            self.score += 1
-                            print(f"Enemy killed! Score: {self.score}")  # Debug print
-                        sprite.destroy()
-                    bullet.kill()
+        """Sweep every bullet from its previous to its current position, the earliest enemy or wall hit wins"""
+        bullets = self.bullets
+        # targets are grown by the bullet size so the swept point stands in for the whole bullet
+        pad_x, pad_y = int(bullets.half_width * 2), int(bullets.half_height * 2)
+        for index in range(len(bullets) - 1, -1, -1):
+            start, end = (bullets.previous_x[index], bullets.previous_y[index]), (bullets.x[index], bullets.y[index])
+            sweep_rect = bullets.sweep_rect(index)
+
+            hit, hit_time = None, 2.0
+            for wall in self.collision_grid.query_rect(sweep_rect):
+                time = segment_entry(start, end, wall.rect.inflate(pad_x, pad_y))
+                if time is not None and time < hit_time:
+                    hit, hit_time = wall, time
+            # enemies are bucketed by center, widen the search so large sprites are not missed
+            search_rect = sweep_rect.inflate(SPATIAL_CELL_SIZE * 2, SPATIAL_CELL_SIZE * 2)
+            for enemy in self.enemy_grid.query_rect(search_rect):
+                time = segment_entry(start, end, enemy.hitbox_rect.inflate(pad_x, pad_y))
+                if time is not None and time < hit_time:
+                    hit, hit_time = enemy, time
+
+            if hit is None:
+                continue
+            if hit in self.enemy_sprites:
+                self.sfx.play('impact')
+                # Check if enemy is not already in death animation
+                if not hit.is_dying:
+                    self.score += 1
+                    print(f"Enemy killed! Score: {self.score}")  # Debug print
+                hit.destroy()
+            bullets.remove(index)
 
     def player_collision(self):
         if not self.invulnerable and pygame.sprite.spritecollide(self.player, self.enemy_sprites, False, pygame.sprite.collide_mask):
             self.player_lives -= 1
-            self.hit_time = pygame.time.get_ticks()
             self.invulnerable = True
+            self.timers.schedule(self.invulnerability_duration, self.invulnerability_timer)
             
             # Play death sound when losing a heart
-            if self.player_death_sound:
-                self.player_death_sound.play()
+            self.sfx.play('player_death')
             
             # Create death effect at player's position
             self.create_death_effect(self.player.rect.center)
@@ -363,88 +559,65 @@ class Game:
             
             if self.player_lives <= 0:
                 self.game_state = 'game_over'
-                # Stop enemy spawning
-                pygame.time.set_timer(self.enemy_event, 0)
                 # Stop game music
                 self.stop_music()
     
+    def spawn_wave(self):
+        """Timer callback: spawn the director's next wave and schedule the one after"""
+        kinds = list(self.enemy_frames)
+        for _ in range(self.director.next_wave(len(self.enemy_sprites))):
+            kind = choice(kinds)
+            enemy = Enemy(self.director.spawn_point(self.player.rect.center), kind, self.enemy_frames[kind],
+                  (self.all_sprites, self.enemy_sprites), self.player, self.collision_sprites, self.collision_grid, self.effects, self.enemy_grid)
+            if self.ai_worker:
+                self.ai_worker.attach(enemy)
+        self.timers.schedule(self.director.wave_interval(), self.spawn_wave)
+
     def invulnerability_timer(self):
-        if self.invulnerable:
-            current_time = pygame.time.get_ticks()
-            if current_time - self.hit_time >= self.invulnerability_duration:
-                self.invulnerable = False
+        self.invulnerable = False
     
     def create_death_effect(self, pos):
         """Create a death effect animation at the given position"""
-        if self.death_effect_frames:
-            effect = {
-                'pos': pos,
-                'frame_index': 0,
-                'start_time': pygame.time.get_ticks(),
-                'frame_duration': 50  # milliseconds per frame
-            }
-            self.death_effects.append(effect)
+        if self.effects.has_kind('player_death'):
+            self.effects.spawn('player_death', pos)
     
     def kill_nearby_enemies(self, pos, radius=None):
         """Kill all enemies within radius of pos"""
         if radius is None:
             radius = DEATH_EFFECT_RADIUS
-        for enemy in self.enemy_sprites:
-            distance = pygame.math.Vector2(enemy.rect.center).distance_to(pos)
-            if distance <= radius:
-                # Check if enemy is not already in death animation
-                if enemy.death_time == 0:
-                    self.score += 1
-                    print(f"Enemy killed by death effect! Score: {self.score}")  # Debug print
-                enemy.destroy()
+        for enemy in self.enemy_grid.query_radius(pos, radius):
+            # Check if enemy is not already in death animation
+            if not enemy.is_dying:
+                self.score += 1
+                print(f"Enemy killed by death effect! Score: {self.score}")  # Debug print
+            enemy.destroy()
     
-    def update_death_effects(self):
-        """Update and draw death effect animations"""
-        current_time = pygame.time.get_ticks()
-        effects_to_remove = []
-        
-        for effect in self.death_effects:
-            # Calculate which frame to show
-            elapsed = current_time - effect['start_time']
-            frame_index = int(elapsed / effect['frame_duration'])
-            
-            if frame_index >= len(self.death_effect_frames):
-                # Animation finished
-                effects_to_remove.append(effect)
-            else:
-                # Draw the current frame
-                frame = self.death_effect_frames[frame_index]
-                # Center the effect on the position
-                rect = frame.get_rect(center=effect['pos'])
-                # Apply camera offset
-                self.display_surface.blit(frame, rect.topleft + self.all_sprites.offset)
-        
-        # Remove finished effects
-        for effect in effects_to_remove:
-            self.death_effects.remove(effect)
-
-    def draw_health(self):
+    def draw_health(self, surface = None):
         """Draw hearts in the top left corner - full and empty"""
+        surface = surface or self.display_surface
         for i in range(PLAYER_MAX_LIVES):
             x = 20 + i * 50  # 50 pixels apart
             y = 20
             # Draw full heart if player has this life, empty heart otherwise
             if i < self.player_lives:
-                self.display_surface.blit(self.heart_full_surf, (x, y))
+                surface.blit(self.heart_full_surf, (x, y))
             else:
-                self.display_surface.blit(self.heart_empty_surf, (x, y))
+                surface.blit(self.heart_empty_surf, (x, y))
     
-    def draw_score(self):
+    def draw_score(self, surface = None):
         """Draw score in the top left corner below hearts"""
-        font = pygame.font.Font(resource_path(FONT_PATH), 32)
-        score_text = font.render(f'Score: {self.score}', True, (225,225,225))
+        surface = surface or self.display_surface
+        # text is only rendered again when the score changes, the renderer then keeps one texture per score
+        if self.score_text is None or self.score_text[0] != self.score:
+            font = assets.font(FONT_PATH, 32)
+            self.score_text = (self.score, font.render(f'Score: {self.score}', True, (225,225,225)), font.render(f'Score: {self.score}', True, (0, 0, 0)))
+        _, score_text, shadow_text = self.score_text
         score_rect = score_text.get_rect(topleft=(20, 80))  # Below the hearts
         
         # Draw shadow
-        shadow_text = font.render(f'Score: {self.score}', True, (0, 0, 0))
         shadow_rect = shadow_text.get_rect(topleft=(23, 83))
-        self.display_surface.blit(shadow_text, shadow_rect)
-        self.display_surface.blit(score_text, score_rect)
+        surface.blit(shadow_text, shadow_rect)
+        surface.blit(score_text, score_rect)
     
     def play_music(self, music):
         """Play background music, stopping current music if playing"""
@@ -463,17 +636,7 @@ class Game:
     
     def update_sfx_volumes(self):
         """Update all sound effect volumes"""
-        volume = self.menu.sfx_volume
-        if self.shoot_sound:
-            self.shoot_sound.set_volume(0.2 * volume)
-        if self.impact_sound:
-            self.impact_sound.set_volume(0.3 * volume)
-        if self.player_death_sound:
-            self.player_death_sound.set_volume(0.4 * volume)
-        if self.player_revive_sound:
-            self.player_revive_sound.set_volume(0.3 * volume)
-        if self.button_click_sound:
-            self.button_click_sound.set_volume(0.3 * volume)
+        self.sfx.set_volume(self.menu.sfx_volume)
     
     def stop_music(self):
         """Stop currently playing music"""
@@ -483,6 +646,7 @@ class Game:
     
     def start_loading(self, target_state):
         """Start loading screen transition"""
+        self.load_deferred()
         self.game_state = 'loading'
         self.loading_start_time = pygame.time.get_ticks()
         self.loading_target_state = target_state
@@ -503,7 +667,7 @@ class Game:
             self.display_surface.blit(frame, frame_rect)
         
         # Draw "Loading..." text
-        font = pygame.font.Font(resource_path(FONT_PATH), 50)
+        font = assets.font(FONT_PATH, 50)
         loading_text = font.render('Loading...', True, (225,225,225))
         text_rect = loading_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 80))
         
@@ -518,69 +682,48 @@ class Game:
         # Play menu music
         self.play_music(self.menu_music)
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+        for click in self.snapshot.clicks:
+            action = self.menu.handle_main_menu_click(click, True)
+            if action == 'start':
+                self.sfx.play('button_click')
+                self.start_loading('playing')
+            elif action == 'settings':
+                self.sfx.play('button_click')
+                self.previous_state = 'menu'
+                self.game_state = 'settings'
+            elif action == 'exit':
+                self.sfx.play('button_click')
                 self.running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_F11:
-                    self.toggle_fullscreen()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                action = self.menu.handle_main_menu_click(self.get_scaled_mouse_pos(), True)
-                if action == 'start':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    self.start_loading('playing')
-                elif action == 'settings':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    self.previous_state = 'menu'
-                    self.game_state = 'settings'
-                elif action == 'exit':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    self.running = False
-        
-        self.menu.draw_main_menu(self.get_scaled_mouse_pos())
+        
+        self.menu.draw_main_menu(self.snapshot.mouse)
 
     def handle_game_over(self):
         """Handle game over state"""
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_F11:
-                    self.toggle_fullscreen()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                action = self.menu.handle_game_over_click(self.get_scaled_mouse_pos(), True)
-                if action == 'play_again':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    if self.player_revive_sound:
-                        self.player_revive_sound.play()
-                    self.start_loading('playing')
-                elif action == 'main_menu':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    self.start_loading('menu')
+        for click in self.snapshot.clicks:
+            action = self.menu.handle_game_over_click(click, True)
+            if action == 'play_again':
+                self.sfx.play('button_click')
+                self.sfx.play('player_revive')
+                # the world is still loaded, so skip the loading screen
+                self.game_state = 'playing'
+                self.reset_game()
+                self.play_music(self.game_music)
+            elif action == 'main_menu':
+                self.sfx.play('button_click')
+                self.start_loading('menu')
         
         # Draw the last game frame in background
         self.display_surface.fill('black')
         if self.all_sprites and self.player:
+            if self.renderer:
+                self.gun.image = self.gun.rotated_image()
             self.all_sprites.draw(self.player.rect.center)
         
         # Draw game over overlay
-        self.menu.draw_game_over(self.score, self.get_scaled_mouse_pos())
+        self.menu.draw_game_over(self.score, self.snapshot.mouse)
     
     def handle_loading(self):
         """Handle loading screen state"""
-        # Check if events happened (to prevent freezing)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_F11:
-                    self.toggle_fullscreen()
-        
         # Draw loading screen
         self.draw_loading_screen()
         
@@ -600,23 +743,16 @@ class Game:
     
     def handle_settings(self):
         """Handle settings menu state"""
-        mouse_pos = self.get_scaled_mouse_pos()
-        mouse_pressed = pygame.mouse.get_pressed()[0]
+        mouse_pos = self.snapshot.mouse
+        mouse_pressed = self.snapshot.held
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_F11:
-                    self.toggle_fullscreen()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                action = self.menu.handle_settings_click(mouse_pos, True)
-                if action == 'back':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    # Return to previous state
-                    self.game_state = self.previous_state if self.previous_state else 'menu'
-                    self.previous_state = None
+        for click in self.snapshot.clicks:
+            action = self.menu.handle_settings_click(click, True)
+            if action == 'back':
+                self.sfx.play('button_click')
+                # Return to previous state
+                self.game_state = self.previous_state if self.previous_state else 'menu'
+                self.previous_state = None
         
         # Handle slider dragging
         self.menu.handle_settings_slider(mouse_pos, mouse_pressed)
@@ -631,6 +767,8 @@ class Game:
             # Draw game in background
             self.display_surface.fill('black')
             if self.all_sprites and self.player:
+                if self.renderer:
+                    self.gun.image = self.gun.rotated_image()
                 self.all_sprites.draw(self.player.rect.center)
                 self.draw_health()
                 self.draw_score()
@@ -641,83 +779,90 @@ class Game:
     
     def handle_paused(self):
         """Handle paused state"""
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    self.game_state = 'playing'
-                if event.key == pygame.K_F11:
-                    self.toggle_fullscreen()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                action = self.menu.handle_pause_menu_click(self.get_scaled_mouse_pos(), True)
-                if action == 'resume':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    self.game_state = 'playing'
-                elif action == 'settings':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    self.previous_state = 'paused'
-                    self.game_state = 'settings'
-                elif action == 'restart':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    if self.player_revive_sound:
-                        self.player_revive_sound.play()
-                    self.game_state = 'playing'
-                    self.setup_game()
-                elif action == 'main_menu':
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    self.start_loading('menu')
+        if pygame.K_ESCAPE in self.snapshot.keys:
+            self.sfx.play('button_click')
+            self.game_state = 'playing'
+        for click in self.snapshot.clicks:
+            action = self.menu.handle_pause_menu_click(click, True)
+            if action == 'resume':
+                self.sfx.play('button_click')
+                self.game_state = 'playing'
+            elif action == 'settings':
+                self.sfx.play('button_click')
+                self.previous_state = 'paused'
+                self.game_state = 'settings'
+            elif action == 'restart':
+                self.sfx.play('button_click')
+                self.sfx.play('player_revive')
+                self.game_state = 'playing'
+                self.reset_game()
+            elif action == 'main_menu':
+                self.sfx.play('button_click')
+                self.start_loading('menu')
         
         # Draw the game in background
         self.display_surface.fill('black')
         if self.all_sprites and self.player:
+            if self.renderer:
+                self.gun.image = self.gun.rotated_image()
             self.all_sprites.draw(self.player.rect.center)
             self.draw_health()
             self.draw_score()
         
         # Draw pause menu overlay
-        self.menu.draw_pause_menu(self.get_scaled_mouse_pos())
+        self.menu.draw_pause_menu(self.snapshot.mouse)
 
     def handle_playing(self, dt):
         """Handle playing state"""
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    if self.button_click_sound:
-                        self.button_click_sound.play()
-                    self.game_state = 'paused'
-                if event.key == pygame.K_F11:
-                    self.toggle_fullscreen()
-            if event.type == self.enemy_event:
-                Enemy(choice(self.spawn_positions), choice(list(self.enemy_frames.values())), 
-                      (self.all_sprites, self.enemy_sprites), self.player, self.collision_sprites)
-
-        # update 
-        self.gun_timer()
-        self.invulnerability_timer()
+        if pygame.K_ESCAPE in self.snapshot.keys:
+            self.sfx.play('button_click')
+            self.game_state = 'paused'
+
+        self.simulate(dt)
+        self.draw_playing()
+
+    def simulate(self, dt):
+        """Advance the world by dt seconds without drawing, the headless server calls this directly"""
+        # a bot or network client stands in for the local input when set
+        self.player.controls = self.player.controller or self.snapshot
+        self.director.observe(dt, self.pacer.work_time)
+        self.timers.advance(dt * 1000)
         self.input()
+        if self.streamer:
+            self.streamer.update(self.player.rect.center)
+        self.lod.assign(self.enemy_sprites, self.player.rect.center)
+        if self.ai_worker:
+            self.ai_worker.step(self.player.rect.center, dt)
         self.all_sprites.update(dt)
+        self.bullets.update(dt, self.timers.time)
+        self.enemy_grid.rebuild(self.enemy_sprites)
+        if self.tile_grid:
+            self.tile_grid.invalidate_occupancy()
         self.bullet_collision()
         self.player_collision()
+        self.effects.update(self.timers.time)
 
-        # draw
-        self.display_surface.fill('black')
-        self.all_sprites.draw(self.player.rect.center)
-        self.update_death_effects()  # Draw death effects on top of game
-        self.draw_health()  # Draw hearts last so they're always on top
-        self.draw_score()  # Draw score in top right
+    def draw_playing(self):
+        target = self.renderer or self.display_surface
+        target.fill('black')
+        self.all_sprites.draw(self.player.rect.center, self.renderer)
+        self.effects.draw(target, self.all_sprites.offset)  # Draw death effects on top of game
+        self.draw_health(target)  # Draw hearts last so they're always on top
+        self.draw_score(target)  # Draw score in top right
+
+    def poll_input(self):
+        """Read this frame's snapshot and handle the keys that work in every state"""
+        self.snapshot = self.input_layer.poll()
+        if self.snapshot.quit:
+            self.running = False
+        if pygame.K_F11 in self.snapshot.keys:
+            self.toggle_fullscreen()
 
     def run(self):
+        first_frame = True
         while self.running:
-            dt = self.clock.tick(60) / 1000
+            dt = self.pacer.wait()
+            self.poll_input()
             
             if self.game_state == 'menu':
                 self.handle_menu()
@@ -733,12 +878,25 @@ class Game:
                 self.handle_settings()
             
             # Render to screen (handles fullscreen scaling if needed)
+            self.pacer.frame_done()
             self.render_to_screen()
             
-            pygame.display.update()
+            if not self.renderer:
+                pygame.display.update()
+
+            if first_frame:
+                first_frame = False
+                self.finish_startup()
 
+        self.stop_ai_worker()
+        if self.streamer:
+            self.streamer.close()
+        self.input_layer.close()
+        if FRAME_STATS_LOG:
+            self.pacer.report()
         pygame.quit()
 
 if __name__ == '__main__':
+    freeze_support()
     game = Game()
     game.run()
\ No newline at end of file
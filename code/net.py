@@ -0,0 +1,513 @@
+from settings import *
+from math import atan2, cos, sin, tau
+from multiprocessing import Process, freeze_support
+from time import monotonic, perf_counter, sleep
+import argparse, socket, struct
+
+# packet kinds, the first byte of every datagram
+HELLO, INPUT, BYE, SNAPSHOT = b'H', b'I', b'B', b'S'
+
+# tick, baseline tick, server send time, score, lives
+HEADER = struct.Struct('<IIdIB')
+# x, y, state, animation frame, gun angle
+PLAYER = struct.Struct('<hhBBB')
+# removed count, updated count
+COUNTS = struct.Struct('<HH')
+# id, field flags
+ENTITY = struct.Struct('<HB')
+POSITION = struct.Struct('<hh')
+POSITION_DELTA = struct.Struct('<bb')
+BYTE = struct.Struct('<B')
+# acked tick, move x, move y, aim x, aim y, trigger
+CONTROLS = struct.Struct('<IffffB')
+
+# which entity fields follow the id, everything unchanged from the baseline is left out
+FIELD_POSITION = 1
+FIELD_POSITION_DELTA = 2
+FIELD_KIND = 4
+FIELD_FRAME = 8
+
+NO_BASELINE = 0xFFFFFFFF
+PLAYER_STATES = ('left', 'right', 'up', 'down')
+SECTIONS = ('enemies', 'bullets')
+EMPTY = {'player': (0, 0, 0, 0, 0), 'enemies': {}, 'bullets': {}}
+
+def quantize(value):
+    # whole pixels in a signed 16 bit range, enough for maps up to 512 tiles across
+    return max(-32768, min(32767, int(round(value))))
+
+def quantize_angle(direction):
+    return int(round(atan2(direction[1], direction[0]) / tau * 256)) & 0xFF
+
+def angle_direction(angle):
+    return pygame.Vector2(cos(angle / 256 * tau), sin(angle / 256 * tau))
+
+def encode(snapshot, baseline = None):
+    """Snapshot as bytes, entities only carry the fields that differ from the baseline"""
+    base = baseline or EMPTY
+    data = bytearray(HEADER.pack(snapshot['tick'], baseline['tick'] if baseline else NO_BASELINE,
+                                 snapshot['time'], snapshot['score'], snapshot['lives']))
+    data += PLAYER.pack(*snapshot['player'])
+    for section in SECTIONS:
+        current, previous = snapshot[section], base[section]
+        removed = [entity_id for entity_id in previous if entity_id not in current]
+        updates = []
+        for entity_id, entity in current.items():
+            old = previous.get(entity_id)
+            if old == entity:
+                continue
+            x, y, kind, frame = entity
+            flags, fields = 0, b''
+            if old is None or old[:2] != entity[:2]:
+                if old is not None and -128 <= x - old[0] <= 127 and -128 <= y - old[1] <= 127:
+                    flags |= FIELD_POSITION_DELTA
+                    fields += POSITION_DELTA.pack(x - old[0], y - old[1])
+                else:
+                    flags |= FIELD_POSITION
+                    fields += POSITION.pack(x, y)
+            if old is None or old[2] != kind:
+                flags |= FIELD_KIND
+                fields += BYTE.pack(kind)
+            if old is None or old[3] != frame:
+                flags |= FIELD_FRAME
+                fields += BYTE.pack(frame)
+            updates.append(ENTITY.pack(entity_id, flags) + fields)
+        data += COUNTS.pack(len(removed), len(updates))
+        data += struct.pack(f'<{len(removed)}H', *removed)
+        data += b''.join(updates)
+    return bytes(data)
+
+def decode(data, baselines):
+    """Rebuild a snapshot from its bytes and the baselines by tick, None if the baseline is gone"""
+    tick, baseline_tick, time, score, lives = HEADER.unpack_from(data, 0)
+    base = EMPTY if baseline_tick == NO_BASELINE else baselines.get(baseline_tick)
+    if base is None:
+        return None
+    offset = HEADER.size
+    snapshot = {'tick': tick, 'time': time, 'score': score, 'lives': lives, 'player': PLAYER.unpack_from(data, offset)}
+    offset += PLAYER.size
+    for section in SECTIONS:
+        entities = dict(base[section])
+        removed_count, update_count = COUNTS.unpack_from(data, offset)
+        offset += COUNTS.size
+        for entity_id in struct.unpack_from(f'<{removed_count}H', data, offset):
+            entities.pop(entity_id, None)
+        offset += removed_count * 2
+        for _ in range(update_count):
+            entity_id, flags = ENTITY.unpack_from(data, offset)
+            offset += ENTITY.size
+            x, y, kind, frame = entities.get(entity_id, (0, 0, 0, 0))
+            if flags & FIELD_POSITION:
+                x, y = POSITION.unpack_from(data, offset)
+                offset += POSITION.size
+            if flags & FIELD_POSITION_DELTA:
+                dx, dy = POSITION_DELTA.unpack_from(data, offset)
+                x, y = x + dx, y + dy
+                offset += POSITION_DELTA.size
+            if flags & FIELD_KIND:
+                kind = data[offset]
+                offset += 1
+            if flags & FIELD_FRAME:
+                frame = data[offset]
+                offset += 1
+            entities[entity_id] = (x, y, kind, frame)
+        snapshot[section] = entities
+    return snapshot
+
+def interpolate(start, end, t):
+    """Blend two snapshots, entities only in the newer one appear as they are"""
+    def lerp(a, b):
+        return int(round(a + (b - a) * t))
+
+    newer = end if t >= 0.5 else start
+    x, y, _, _, angle = start['player']
+    end_x, end_y, _, _, end_angle = end['player']
+    # turn the short way round
+    angle = (angle + round((((end_angle - angle + 128) % 256) - 128) * t)) & 0xFF
+    state = {'tick': newer['tick'], 'score': newer['score'], 'lives': newer['lives'],
+             'player': (lerp(x, end_x), lerp(y, end_y), newer['player'][2], newer['player'][3], angle)}
+    for section in SECTIONS:
+        entities = {}
+        old = start[section]
+        for entity_id, entity in end[section].items():
+            previous = old.get(entity_id)
+            if previous:
+                entities[entity_id] = (lerp(previous[0], entity[0]), lerp(previous[1], entity[1]), entity[2], entity[3])
+            else:
+                entities[entity_id] = entity
+        state[section] = entities
+    return state
+
+class RemoteController:
+    """Player controls received from the client that owns the player, same interface as batch.KiteBot"""
+    def __init__(self):
+        self.direction = pygame.Vector2()
+        self.aim = pygame.Vector2(0, 1)
+        self.fire = False
+
+    def move_direction(self):
+        return pygame.Vector2(self.direction)
+
+    def aim_pos(self):
+        return (WINDOW_WIDTH / 2 + self.aim.x * 100, WINDOW_HEIGHT / 2 + self.aim.y * 100)
+
+    def firing(self):
+        return self.fire
+
+class RemoteClient:
+    def __init__(self, address):
+        self.address = address
+        self.last_ack = None
+        self.last_seen = monotonic()
+
+class Server:
+    """Owns the simulation and sends each client snapshots delta-compressed against its last ack"""
+    def __init__(self, game, port = NET_PORT, host = '0.0.0.0'):
+        self.game = game
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.socket.setblocking(False)
+
+        # the first client to join steers the player, later ones spectate
+        self.clients = {}
+        self.owner = None
+        self.controller = RemoteController()
+        if game.player.controller is None:
+            game.player.controller = self.controller
+
+        self.tick = 0
+        self.history = {}
+        self.enemy_ids = {}
+        self.next_enemy_id = 0
+
+        # stats
+        self.simulate_time = 0
+        self.encode_time = 0
+        self.bytes_sent = 0
+        self.snapshots_sent = 0
+
+    def receive(self):
+        while True:
+            try:
+                data, address = self.socket.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                break
+            kind = data[:1]
+            client = self.clients.get(address)
+            if kind == HELLO and client is None:
+                client = self.clients[address] = RemoteClient(address)
+                if self.owner is None:
+                    self.owner = address
+            if client is None:
+                continue
+            client.last_seen = monotonic()
+            if kind == INPUT and len(data) == 1 + CONTROLS.size:
+                ack, move_x, move_y, aim_x, aim_y, fire = CONTROLS.unpack_from(data, 1)
+                if ack != NO_BASELINE and (client.last_ack is None or ack > client.last_ack):
+                    client.last_ack = ack
+                if address == self.owner:
+                    self.controller.direction.update(move_x, move_y)
+                    if aim_x or aim_y:
+                        self.controller.aim.update(aim_x, aim_y)
+                    self.controller.fire = bool(fire)
+            elif kind == BYE:
+                self.drop(address)
+
+    def drop(self, address):
+        del self.clients[address]
+        if address == self.owner:
+            # control passes to the longest connected spectator
+            self.owner = next(iter(self.clients), None)
+            self.controller.__init__()
+
+    def capture(self):
+        """Quantized world state for this tick"""
+        game = self.game
+        kinds = sorted(game.enemy_frames)
+        enemies = {}
+        live_ids = {}
+        for enemy in game.enemy_sprites:
+            enemy_id = self.enemy_ids.get(enemy)
+            if enemy_id is None:
+                enemy_id, self.next_enemy_id = self.next_enemy_id, (self.next_enemy_id + 1) & 0xFFFF
+            live_ids[enemy] = enemy_id
+            enemies[enemy_id] = (quantize(enemy.rect.centerx), quantize(enemy.rect.centery),
+                                 kinds.index(enemy.kind), int(enemy.frame_index) % len(enemy.frames))
+        self.enemy_ids = live_ids
+
+        bullets = game.bullets
+        player = game.player
+        return {
+            'tick': self.tick,
+            'time': monotonic(),
+            'score': game.score,
+            'lives': max(0, game.player_lives),
+            'player': (quantize(player.rect.centerx), quantize(player.rect.centery), PLAYER_STATES.index(player.state),
+                       int(player.frame_index) % len(player.frames[player.state]), quantize_angle(game.gun.player_direction)),
+            'enemies': enemies,
+            'bullets': {bullets.ids[index]: (quantize(bullets.x[index]), quantize(bullets.y[index]), 0, 0) for index in range(len(bullets))}
+        }
+
+    def broadcast(self):
+        snapshot = self.capture()
+        self.history[self.tick] = snapshot
+        while len(self.history) > NET_HISTORY:
+            del self.history[next(iter(self.history))]
+
+        for client in list(self.clients.values()):
+            if (monotonic() - client.last_seen) * 1000 > NET_TIMEOUT:
+                self.drop(client.address)
+                continue
+            start = perf_counter()
+            data = SNAPSHOT + encode(snapshot, self.history.get(client.last_ack))
+            self.encode_time += perf_counter() - start
+            try:
+                self.socket.sendto(data, client.address)
+            except OSError:
+                continue
+            self.bytes_sent += len(data)
+            self.snapshots_sent += 1
+
+    def step(self, dt):
+        """One server tick: read client packets, simulate and send snapshots when due"""
+        pygame.event.pump()
+        self.receive()
+        start = perf_counter()
+        self.game.simulate(dt)
+        self.simulate_time += perf_counter() - start
+        if self.game.game_state == 'game_over':
+            # sessions keep going, a lost run starts over
+            self.game.reset_game()
+            self.game.game_state = 'playing'
+        self.tick += 1
+        if self.tick % max(1, NET_TICK_RATE // NET_SNAPSHOT_RATE) == 0:
+            self.broadcast()
+
+    def close(self):
+        self.socket.close()
+
+class SnapshotClient:
+    """Receives and decodes snapshots, acks them and samples an interpolated state"""
+    def __init__(self, host = '127.0.0.1', port = NET_PORT):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+        self.baselines = {}
+        self.buffer = []
+        self.latest_tick = NO_BASELINE
+        self.offset = None
+        self.last_hello = 0
+
+        # stats
+        self.bytes_received = 0
+        self.full_bytes = 0
+        self.snapshots = 0
+        self.latencies = []
+
+    def connect(self):
+        """Say hello until the first snapshot arrives, the server may still be starting"""
+        if self.latest_tick == NO_BASELINE and monotonic() - self.last_hello > 0.5:
+            self.socket.sendto(HELLO, self.address)
+            self.last_hello = monotonic()
+
+    def receive(self):
+        """Decode every waiting snapshot, returns True if a new one arrived"""
+        received = False
+        while True:
+            try:
+                data = self.socket.recv(65536)
+            except (BlockingIOError, ConnectionRefusedError, ConnectionResetError):
+                break
+            if data[:1] != SNAPSHOT:
+                continue
+            snapshot = decode(data[1:], self.baselines)
+            if snapshot is None or (self.latest_tick != NO_BASELINE and snapshot['tick'] <= self.latest_tick):
+                continue
+            now = monotonic()
+            self.bytes_received += len(data)
+            self.full_bytes += 1 + len(encode(snapshot))
+            self.snapshots += 1
+            # only meaningful when client and server share a clock, as on loopback
+            self.latencies.append((now - snapshot['time']) * 1000)
+
+            # the smallest observed gap is the best estimate of the clock offset
+            offset = snapshot['time'] - now
+            self.offset = offset if self.offset is None else max(self.offset, offset)
+
+            self.latest_tick = snapshot['tick']
+            self.baselines[snapshot['tick']] = snapshot
+            while len(self.baselines) > NET_HISTORY:
+                del self.baselines[next(iter(self.baselines))]
+            self.buffer.append(snapshot)
+            received = True
+        return received
+
+    def send_controls(self, direction = (0, 0), aim = (0, 0), fire = False):
+        """Controls for the player, also acks the newest snapshot"""
+        self.connect()
+        self.socket.sendto(INPUT + CONTROLS.pack(self.latest_tick, direction[0], direction[1], aim[0], aim[1], fire), self.address)
+
+    def sample(self):
+        """State NET_INTERP_DELAY behind the server, None before the first snapshot"""
+        if not self.buffer:
+            return None
+        render_time = monotonic() + self.offset - NET_INTERP_DELAY / 1000
+        while len(self.buffer) > 2 and self.buffer[1]['time'] <= render_time:
+            self.buffer.pop(0)
+        start = self.buffer[0]
+        if len(self.buffer) == 1 or render_time <= start['time']:
+            return interpolate(start, start, 0)
+        end = self.buffer[1]
+        return interpolate(start, end, min(1.0, (render_time - start['time']) / (end['time'] - start['time'])))
+
+    def close(self):
+        try:
+            self.socket.sendto(BYE, self.address)
+        except OSError:
+            pass
+        self.socket.close()
+
+def serve(port = NET_PORT, seconds = None, bot = False):
+    """Run a headless authoritative server, optionally with the batch bot steering the player"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    from main import Game
+    from pacing import FramePacer
+
+    game = Game()
+    game.setup_game()
+    game.game_state = 'playing'
+    if bot:
+        from batch import KiteBot
+        bot = KiteBot(game)
+        game.player.controller = bot
+    # ticks stay evenly spaced whatever pacing the local settings pick
+    game.pacer = FramePacer(game.clock, 'hybrid', NET_TICK_RATE)
+    server = Server(game, port)
+    print(f'Serving on port {port}')
+
+    dt = 1 / NET_TICK_RATE
+    start = monotonic()
+    try:
+        while seconds is None or monotonic() - start < seconds:
+            game.pacer.wait()
+            if bot:
+                bot.update()
+            server.step(dt)
+    except KeyboardInterrupt:
+        pass
+
+    ticks = max(1, server.tick)
+    print(f'server: {server.tick} ticks, simulate {server.simulate_time * 1000 / ticks:.2f} ms/tick, '
+          f'encode {server.encode_time * 1000 / max(1, server.snapshots_sent):.3f} ms/snapshot, '
+          f'{server.bytes_sent} bytes in {server.snapshots_sent} snapshots')
+    server.close()
+    pygame.quit()
+
+def play(host = '127.0.0.1', port = NET_PORT):
+    """Thin client: sends controls and draws interpolated snapshots over the locally loaded map"""
+    from main import Game
+
+    game = Game()
+    game.setup_game()
+    kinds = sorted(game.enemy_frames)
+    client = SnapshotClient(host, port)
+
+    while game.running:
+        game.poll_input()
+        snapshot = game.snapshot
+        if pygame.K_ESCAPE in snapshot.keys:
+            game.running = False
+
+        aim = pygame.Vector2(snapshot.aim_pos()) - (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2)
+        aim = aim.normalize() if aim else aim
+        client.send_controls(snapshot.move_direction(), aim, snapshot.firing())
+        client.receive()
+
+        state = client.sample()
+        if state:
+            x, y, player_state, frame, angle = state['player']
+            player, gun = game.player, game.gun
+            player.rect.center = (x, y)
+            frames = player.frames[PLAYER_STATES[player_state]]
+            player.image = frames[frame % len(frames)]
+            gun.player_direction = angle_direction(angle)
+            gun.rotate_gun()
+            gun.rect.center = player.rect.center + gun.player_direction * gun.distance
+            game.score, game.player_lives = state['score'], state['lives']
+            if game.streamer:
+                game.streamer.update(player.rect.center)
+
+            game.display_surface.fill('black')
+            game.all_sprites.draw(player.rect.center)
+            offset_x, offset_y = game.all_sprites.offset
+            blit_sequence = []
+            for x, y, kind, frame in state['enemies'].values():
+                frames = game.enemy_frames[kinds[kind]]
+                image = frames[frame % len(frames)]
+                blit_sequence.append((image, image.get_rect(center = (x + offset_x, y + offset_y))))
+            for x, y, _, _ in state['bullets'].values():
+                blit_sequence.append((game.bullet_surf, game.bullet_surf.get_rect(center = (x + offset_x, y + offset_y))))
+            game.display_surface.blits(blit_sequence, doreturn = False)
+            game.draw_health()
+            game.draw_score()
+            game.pacer.frame_done()
+            game.render_to_screen()
+            if not game.renderer:
+                pygame.display.update()
+        game.pacer.wait()
+
+    client.close()
+    game.input_layer.close()
+    if FRAME_STATS_LOG:
+        game.pacer.report()
+    if game.streamer:
+        game.streamer.close()
+    pygame.quit()
+
+def loopback(seconds = 10, clients = 2, port = NET_PORT):
+    """Server with the bot in a child process, headless clients here, report bandwidth and latency"""
+    server = Process(target = serve, args = (port, seconds + 5, True))
+    server.start()
+    receivers = [SnapshotClient('127.0.0.1', port) for _ in range(clients)]
+
+    first_ticks = [None] * clients
+    start = None
+    while start is None or monotonic() - start < seconds:
+        for index, client in enumerate(receivers):
+            client.connect()
+            if client.receive():
+                client.send_controls()
+                if first_ticks[index] is None:
+                    first_ticks[index] = client.latest_tick
+                    start = start or monotonic()
+        sleep(0.001)
+
+    for index, client in enumerate(receivers):
+        ticks = max(1, client.latest_tick - first_ticks[index])
+        latencies = sorted(client.latencies)
+        print(f'client {index}: {client.snapshots} snapshots, '
+              f'{client.bytes_received / client.snapshots:.0f} bytes/snapshot delta vs {client.full_bytes / client.snapshots:.0f} full, '
+              f'{client.bytes_received / ticks:.1f} bytes/tick, '
+              f'latency mean {sum(latencies) / len(latencies):.2f} ms p95 {latencies[int(len(latencies) * 0.95)]:.2f} ms')
+        client.close()
+    server.join()
+
+if __name__ == '__main__':
+    freeze_support()
+    parser = argparse.ArgumentParser(description = 'Overrun network session')
+    parser.add_argument('mode', choices = ('server', 'client', 'loopback'))
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = NET_PORT)
+    parser.add_argument('--bot', action = 'store_true', help = 'server only, the batch bot steers the player')
+    parser.add_argument('--seconds', type = float, default = 10, help = 'loopback only')
+    parser.add_argument('--clients', type = int, default = 2, help = 'loopback only')
+    args = parser.parse_args()
+
+    if args.mode == 'server':
+        serve(args.port, bot = args.bot)
+    elif args.mode == 'client':
+        play(args.host, args.port)
+    else:
+        loopback(args.seconds, args.clients, args.port)
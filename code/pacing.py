@@ -0,0 +1,146 @@
+from settings import *
+from collections import deque
+from time import perf_counter, sleep
+
+PACING_MODES = ('tick', 'tick_busy_loop', 'hybrid', 'vsync', 'uncapped')
+
+# frames this much longer than the target interval count as late
+LATE_FACTOR = 1.5
+
+# vsync is trusted once this many frames averaged at least this share of the display period
+VSYNC_CHECK_FRAMES = 60
+VSYNC_MIN_SHARE = 0.5
+
+def display_period():
+    """Seconds per display refresh, FRAME_DISPLAY_REFRESH when pygame cannot tell"""
+    get_rate = getattr(pygame.display, 'get_current_refresh_rate', None)
+    try:
+        rate = get_rate() if get_rate else 0
+    except pygame.error:
+        rate = 0
+    return 1 / (rate or FRAME_DISPLAY_REFRESH)
+
+class FramePacer:
+    """Ends every frame in the selected pacing mode and keeps statistics on the frame intervals"""
+    def __init__(self, clock, mode = None, rate = None):
+        self.clock = clock
+        self.mode = mode or os.environ.get('OVERRUN_FRAME_PACING', FRAME_PACING)
+        if self.mode not in PACING_MODES:
+            print(f"Warning: unknown frame pacing '{self.mode}', using tick")
+            self.mode = 'tick'
+        self.rate = rate or int(os.environ.get('OVERRUN_FRAME_RATE', FRAME_RATE))
+        self.period = 1 / self.rate
+
+        # the hybrid limiter schedules against fixed deadlines, so short and long frames even out
+        self.deadline = None
+        self.last = None
+
+        # milliseconds spent on the last frame before it started waiting, what the spawn director reads
+        self.work_time = 0
+        self.done = None
+        self.intervals = deque(maxlen = FRAME_STATS_WINDOW)
+
+        # frames until a vsync mode checks that the flip really waited
+        self.vsync_check = VSYNC_CHECK_FRAMES
+
+    def restart(self):
+        """Forget the previous frame, after a load that should not count as one"""
+        self.deadline = None
+        self.last = None
+
+    def frame_done(self):
+        """Mark the end of this frame's work, call it before presenting"""
+        self.done = perf_counter()
+
+    def wait(self):
+        """Wait until the next frame is due, returns the seconds since the previous one"""
+        start = perf_counter()
+        if self.last is not None:
+            # a vsync flip waits before wait() is reached, frame_done marks where the work ended
+            self.work_time = ((self.done or start) - self.last) * 1000
+        self.done = None
+
+        if self.mode == 'tick':
+            self.clock.tick(self.rate)
+        elif self.mode == 'tick_busy_loop':
+            self.clock.tick_busy_loop(self.rate)
+        else:
+            if self.mode == 'hybrid':
+                self.sleep_then_spin(start)
+            # vsync waits in the display flip and uncapped does not wait at all, tick only keeps get_fps working
+            self.clock.tick()
+
+        now = perf_counter()
+        dt = now - self.last if self.last is not None else 0
+        if self.last is not None:
+            self.intervals.append(dt * 1000)
+            if self.mode == 'vsync':
+                self.check_vsync()
+        self.last = now
+        return dt
+
+    def check_vsync(self):
+        """Fall back to the hybrid limiter when the driver accepted vsync but the flip does not wait"""
+        self.vsync_check -= 1
+        if self.vsync_check:
+            return
+        recent = list(self.intervals)[-VSYNC_CHECK_FRAMES:]
+        mean = sum(recent) / len(recent)
+        if mean < display_period() * 1000 * VSYNC_MIN_SHARE:
+            print(f"Warning: vsync is not limiting frames ({1000 / mean:.0f} fps), using the hybrid frame limiter")
+            self.mode = 'hybrid'
+            self.intervals.clear()
+
+    def sleep_then_spin(self, start):
+        """Sleep, which can overshoot by a scheduler slice, until just before the deadline and spin the rest"""
+        deadline = (self.deadline or start) + self.period
+        if deadline < start - self.period:
+            # more than a frame behind, start a new schedule instead of rushing to catch up
+            deadline = start
+        remaining = deadline - start - FRAME_SPIN_MARGIN / 1000
+        if remaining > 0:
+            sleep(remaining)
+        while perf_counter() < deadline:
+            pass
+        self.deadline = deadline
+
+    def stats(self):
+        """Frame interval statistics in milliseconds, jitter is the mean distance from the target interval.
+        Uncapped frames have no target, so their jitter and late count are None"""
+        intervals = sorted(self.intervals)
+        if not intervals:
+            return None
+        count = len(intervals)
+        mean = sum(intervals) / count
+        target = self.target_interval()
+        return {
+            'frames': count,
+            'mean': mean,
+            'fps': 1000 / mean if mean else 0,
+            'jitter': sum(abs(interval - target) for interval in intervals) / count if target else None,
+            'stddev': (sum((interval - mean) ** 2 for interval in intervals) / count) ** 0.5,
+            'p99': intervals[min(count - 1, int(count * 0.99))],
+            'max': intervals[-1],
+            'late': sum(interval > target * LATE_FACTOR for interval in intervals) if target else None
+        }
+
+    def target_interval(self):
+        """Milliseconds a frame should take, the display period under vsync and None uncapped"""
+        if self.mode == 'uncapped':
+            return None
+        if self.mode == 'vsync':
+            return display_period() * 1000
+        return self.period * 1000
+
+    def report(self):
+        stats = self.stats()
+        if stats is None:
+            return
+        target = self.target_interval()
+        if target is None:
+            target, jitter, late = 'no target', 'n/a', 'n/a'
+        else:
+            target, jitter, late = f'{1000 / target:.0f} fps', f"{stats['jitter']:.2f} ms", stats['late']
+        print(f"Frame pacing ({self.mode}, {target}): {stats['fps']:.1f} fps, mean {stats['mean']:.2f} ms, "
+              f"jitter {jitter}, stddev {stats['stddev']:.2f} ms, p99 {stats['p99']:.2f} ms, "
+              f"max {stats['max']:.2f} ms, late frames {late} of {stats['frames']}")
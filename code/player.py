@@ -1,18 +1,13 @@
 from settings import * 
-
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except AttributeError:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+from assets import assets
+from controls import IDLE_INPUT
 
 class Player(pygame.sprite.Sprite):
     def __init__(self, pos, groups, collision_sprites):
         super().__init__(groups)
         self.load_images()
         self.state, self.frame_index = 'right', 0
-        self.image = pygame.image.load(resource_path(join('images', 'player', 'down', '0.png'))).convert_alpha()
+        self.image = assets.image(join('images', 'player', 'down', '0.png'), group = 'player')
         self.rect = self.image.get_rect(center = pos)
         self.hitbox_rect = self.rect.inflate(-60, -90)
     
@@ -21,23 +16,16 @@ class Player(pygame.sprite.Sprite):
         self.speed = PLAYER_SPEED
         self.collision_sprites = collision_sprites
 
-    def load_images(self):
-        self.frames = {'left': [], 'right': [], 'up': [], 'down': []}
+        # replaces keyboard and mouse when set, see batch.KiteBot
+        self.controller = None
+        # what this tick reads, the controller or the game's input snapshot, set by Game.simulate
+        self.controls = IDLE_INPUT
 
-        for state in self.frames.keys():
-            player_state_path = resource_path(join('images', 'player', state))
-            for folder_path, sub_folders, file_names in walk(player_state_path):
-                if file_names:
-                    for file_name in sorted(file_names, key= lambda name: int(name.split('.')[0])):
-                        full_path = join(folder_path, file_name)
-                        surf = pygame.image.load(full_path).convert_alpha()
-                        self.frames[state].append(surf)
+    def load_images(self):
+        self.frames = {state: assets.frames(join('images', 'player', state), 'player') for state in ('left', 'right', 'up', 'down')}
 
     def input(self):
-        keys = pygame.key.get_pressed()
-        self.direction.x = int(keys[pygame.K_RIGHT] or keys[pygame.K_d]) - int(keys[pygame.K_LEFT] or keys[pygame.K_a])
-        self.direction.y = int(keys[pygame.K_DOWN] or keys[pygame.K_s]) - int(keys[pygame.K_UP] or keys[pygame.K_w])
-        self.direction = self.direction.normalize() if self.direction else self.direction
+        self.direction = self.controls.move_direction()
 
     def move(self, dt):
         self.hitbox_rect.x += self.direction.x * self.speed * dt
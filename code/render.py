@@ -0,0 +1,121 @@
+from settings import *
+
+# textures not drawn for this many frames are released, which drops one-off text renders
+TEXTURE_IDLE_FRAMES = 120
+
+def render_backend():
+    """Backend name from RENDER_BACKEND, OVERRUN_RENDER_BACKEND in the environment wins"""
+    return os.environ.get('OVERRUN_RENDER_BACKEND', RENDER_BACKEND)
+
+def create_renderer(title, size, icon = None, vsync = False):
+    """TextureRenderer in its own window, None when the surface backend is used or no renderer works"""
+    if render_backend() != 'texture':
+        return None
+    try:
+        from pygame._sdl2.video import Window, Renderer
+        from pygame._sdl2 import error as sdl_error
+    except ImportError:
+        print('Warning: pygame._sdl2 not available, using the surface renderer')
+        return None
+
+    # a renderer cannot share the display module's window, which only stays around hidden so convert() has a pixel format
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    window = Window(title, size)
+    if icon:
+        window.set_icon(icon)
+
+    accelerated = RENDER_ACCELERATED and os.environ.get('OVERRUN_RENDER_ACCELERATED', '1') != '0'
+    # an accelerated driver first, then SDL's own software renderer, which keeps the texture path on CPU-only machines
+    for flag in ((1, 0) if accelerated else (0,)):
+        try:
+            renderer = Renderer(window, accelerated = flag, vsync = RENDER_VSYNC or vsync)
+        except (pygame.error, sdl_error) as error:
+            print(f'Warning: {"accelerated" if flag else "software"} renderer unavailable: {error}')
+            continue
+        return TextureRenderer(window, renderer, size)
+    print('Warning: no SDL renderer available, using the surface renderer')
+    window.destroy()
+    return None
+
+class TextureRenderer:
+    """Draws through pygame._sdl2: surfaces are uploaded once and copied, scaled and rotated by the renderer"""
+    def __init__(self, window, renderer, size):
+        from pygame._sdl2.video import Texture
+        self.Texture = Texture
+        self.window = window
+        self.renderer = renderer
+        self.size = size
+        # fullscreen scaling happens in the renderer, everything is drawn at the game's own resolution
+        self.renderer.logical_size = size
+
+        # id(surface) -> [surface, texture, last frame used], holding the surface keeps its id unique
+        self.textures = {}
+        self.frame = 0
+        self.drawn = False
+
+        # menus and overlays are still drawn in software, this texture shows them
+        self.overlay = None
+
+    def texture(self, surface):
+        entry = self.textures.get(id(surface))
+        if entry is None:
+            entry = self.textures[id(surface)] = [surface, self.Texture.from_surface(self.renderer, surface), self.frame]
+        else:
+            entry[2] = self.frame
+        return entry[1]
+
+    def get_size(self):
+        return self.size
+
+    def fill(self, color):
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.clear()
+        self.drawn = True
+
+    def blit(self, surface, dest):
+        x, y = dest[0], dest[1]
+        self.texture(surface).draw(dstrect = (x, y, surface.get_width(), surface.get_height()))
+        self.drawn = True
+
+    def blits(self, blit_sequence, doreturn = True):
+        """Same calling convention as Surface.blits, every entry is one texture copy"""
+        texture = self.texture
+        for surface, dest in blit_sequence:
+            texture(surface).draw(dstrect = (dest[0], dest[1], surface.get_width(), surface.get_height()))
+        self.drawn = True
+
+    def draw_items(self, items, offset_x, offset_y):
+        """(image, rect, sprite) triples, sprites with an angle are rotated by the renderer"""
+        texture = self.texture
+        for image, rect, sprite in items:
+            dstrect = (rect.x + offset_x, rect.y + offset_y, rect.width, rect.height)
+            angle = getattr(sprite, 'angle', None)
+            if angle is None:
+                texture(image).draw(dstrect = dstrect)
+            else:
+                # the renderer turns clockwise, see Gun.rotated_image for the software version
+                texture(image).draw(dstrect = dstrect, angle = abs(angle) if sprite.flip else -angle, flip_y = sprite.flip)
+        self.drawn = True
+
+    def present(self, surface):
+        """Show this frame: the texture draws if any were made, otherwise the software surface"""
+        if not self.drawn:
+            if self.overlay is None or self.overlay.width != surface.get_width() or self.overlay.height != surface.get_height():
+                self.overlay = self.Texture(self.renderer, surface.get_size(), streaming = True)
+            self.overlay.update(surface)
+            self.renderer.clear()
+            self.overlay.draw()
+        self.renderer.present()
+        self.drawn = False
+
+        self.frame += 1
+        if self.frame % TEXTURE_IDLE_FRAMES == 0:
+            oldest = self.frame - TEXTURE_IDLE_FRAMES
+            self.textures = {key: entry for key, entry in self.textures.items() if entry[2] >= oldest}
+
+    def set_fullscreen(self, fullscreen):
+        if fullscreen:
+            self.window.set_fullscreen(desktop = True)
+        else:
+            self.window.set_windowed()
+        return self.window.size
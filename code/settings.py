@@ -7,6 +7,33 @@ from os import walk
 WINDOW_WIDTH, WINDOW_HEIGHT = 1440, 720 
 TILE_SIZE = 64
 
+# Startup settings
+FAST_START = True  # init only display and font, audio and gameplay assets load after the menu shows, OVERRUN_FAST_START=0 loads everything first
+STARTUP_TARGET_TIME = 500  # milliseconds from launch to the first menu frame, slower launches are flagged in the startup log
+STARTUP_LOG = True  # print the time spent in every startup phase
+
+# Render settings
+RENDER_BACKEND = 'surface'  # 'texture' draws through an SDL renderer, OVERRUN_RENDER_BACKEND overrides it
+RENDER_ACCELERATED = True  # False (or OVERRUN_RENDER_ACCELERATED=0) forces SDL's software renderer for the texture backend
+RENDER_VSYNC = False  # FRAME_PACING = 'vsync' turns it on as well
+RENDER_THREADS = 0  # threads composing the ground layer in horizontal strips with their own tile copies, 0 or 1 draws on the main thread
+
+# Frame pacing settings
+FRAME_PACING = 'hybrid'  # 'tick', 'tick_busy_loop', 'hybrid', 'vsync' or 'uncapped', OVERRUN_FRAME_PACING overrides it
+FRAME_RATE = 60  # target frames per second, e.g. 60, 120 or 144, OVERRUN_FRAME_RATE overrides it, vsync follows the display
+FRAME_DISPLAY_REFRESH = 60  # Hz assumed for vsync when pygame cannot report the display's refresh rate
+FRAME_SPIN_MARGIN = 2  # milliseconds before the deadline the hybrid limiter stops sleeping and spins
+FRAME_STATS_WINDOW = 600  # most recent frames the jitter statistics cover
+FRAME_STATS_LOG = True  # print the jitter statistics when the game closes
+
+# Map settings
+MAP_PATH = join('data', 'maps', 'world.tmx')
+WORLD_STREAMING = False  # stream finite maps in chunks too, infinite maps are always streamed
+STREAM_CHUNK_SIZE = 16  # tiles per chunk side for finite maps, infinite maps use their own chunks
+STREAM_RADIUS = 2  # chunks loaded in every direction around the player
+STREAM_MEMORY_BUDGET = 32 * 1024 * 1024  # bytes of chunk sprites kept before distant chunks are evicted
+STREAM_INTEGRATE_PER_FRAME = 2  # decoded chunks turned into sprites per frame
+
 # Font settings
 FONT_PATH = join('fonts', 'QuinqueFive.ttf')
 
@@ -26,12 +53,61 @@ AUDIO_BUTTON_CLICK = join('audio', 'button_click.mp3')  # Also used for pause
 AUDIO_MENU_MUSIC = join('audio', 'menu_music.mp3')
 AUDIO_GAME_MUSIC = join('audio', 'game_music.mp3')
 
+# Sound effect mixer settings
+SFX_CHANNEL_GROUPS = {  # reserved channels and voice stealing policy per category
+    'weapon': (4, 'oldest'),
+    'impact': (4, 'quietest'),
+    'player': (2, 'oldest'),
+    'ui': (2, 'oldest'),
+}
+SFX_FREE_CHANNELS = 4  # unreserved channels left for background music
+SFX_COALESCE_WINDOW = 30  # milliseconds within which identical sounds are merged into one voice
+
+# Input settings
+INPUT_RECORD_PATH = None  # write every frame's input snapshot here as JSON lines, OVERRUN_RECORD_INPUT overrides it
+INPUT_REPLAY_PATH = None  # play recorded snapshots back instead of the live input, OVERRUN_REPLAY_INPUT overrides it
+
 # Player settings
 PLAYER_SPEED = 500
 
 # Enemy settings
 ENEMY_SPEED = 200
-ENEMY_SPAWN_RATE = 300  # milliseconds between enemy spawns
+ENEMY_DEATH_DURATION = 400  # milliseconds the death silhouette stays on screen
+ENEMY_DEATH_FADE_FRAMES = 6  # white flash followed by fading copies, 1 keeps a static silhouette
+
+# Spawn director settings
+DIRECTOR_WAVE_INTERVAL = (2000, 800)  # milliseconds between waves at the start and at full difficulty
+DIRECTOR_WAVE_SIZE = (6, 24)  # enemies per wave at the start and at full difficulty
+DIRECTOR_RAMP_TIME = 180000  # milliseconds of play until full difficulty
+DIRECTOR_ENTITY_BUDGET = 250  # most enemies alive at once
+DIRECTOR_SPAWN_MARGIN = 64  # pixels outside the viewport a spawn point has to be
+DIRECTOR_TARGET_FRAME_TIME = 1000 / 60  # milliseconds of work per frame before spawning backs off
+DIRECTOR_MIN_BUDGET_SCALE = 0.2  # the budget never shrinks below this share
+
+# Spatial query settings
+SPATIAL_CELL_SIZE = 128  # pixels per side of an enemy grid cell
+
+# Crowd separation settings
+CROWD_SEPARATION_RADIUS = 56  # pixels, closer enemies push each other apart
+CROWD_MAX_NEIGHBORS = 6  # neighbours considered per enemy, keeps the cost flat in dense swarms
+CROWD_SEPARATION_WEIGHT = 1.5  # strength of the push relative to seeking the player
+
+# Simulation level of detail settings
+LOD_NEAR_MARGIN = 128  # pixels around the viewport that still get full updates
+LOD_FAR_MARGIN = 768  # pixels around the viewport before enemies drop to the lowest tier
+LOD_UPDATE_INTERVALS = (1, 2, 4)  # ticks between updates for the near, off-screen and far tiers
+
+# Enemy AI worker settings
+ENEMY_AI_WORKER = False  # run enemy steering and collision in a separate process
+ENEMY_AI_CAPACITY = 2048  # enemy slots in the shared memory buffers
+
+# Network settings
+NET_PORT = 7777
+NET_TICK_RATE = 60  # server simulation steps per second
+NET_SNAPSHOT_RATE = 20  # snapshots sent to each client per second
+NET_HISTORY = 64  # snapshots the server keeps as delta baselines
+NET_INTERP_DELAY = 100  # milliseconds the client renders behind the newest snapshot
+NET_TIMEOUT = 3000  # milliseconds of silence before the server drops a client
 
 # Gun/Bullet settings
 BULLET_SPEED = 1200
@@ -0,0 +1,138 @@
+from settings import *
+from math import hypot
+
+class SpatialGrid:
+    """Uniform grid bucketing sprites by the cell of their center"""
+    def __init__(self, cell_size = SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        self.cells.clear()
+
+    def insert(self, item, x, y):
+        key = (int(x // self.cell_size), int(y // self.cell_size))
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [(item, x, y)]
+        else:
+            bucket.append((item, x, y))
+
+    def insert_rect(self, item, rect):
+        """Bucket an item in every cell its rect overlaps, for static colliders"""
+        cell_size = self.cell_size
+        for cell_x in range(rect.left // cell_size, (rect.right - 1) // cell_size + 1):
+            for cell_y in range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1):
+                self.cells.setdefault((cell_x, cell_y), []).append((item, rect.centerx, rect.centery))
+
+    def remove_rect(self, item, rect):
+        cell_size = self.cell_size
+        for cell_x in range(rect.left // cell_size, (rect.right - 1) // cell_size + 1):
+            for cell_y in range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if bucket:
+                    bucket[:] = [entry for entry in bucket if entry[0] is not item]
+
+    def rebuild(self, sprites):
+        """Re-bucket every sprite from its current rect center, called once per tick"""
+        self.cells.clear()
+        cell_size = self.cell_size
+        cells = self.cells
+        for sprite in sprites:
+            x, y = sprite.rect.center
+            key = (x // cell_size, y // cell_size)
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [(sprite, x, y)]
+            else:
+                bucket.append((sprite, x, y))
+
+    def query_radius(self, pos, radius):
+        """Return the items whose position lies within radius of pos"""
+        x, y = pos
+        radius_squared = radius * radius
+        cell_size = self.cell_size
+        min_x, max_x = int((x - radius) // cell_size), int((x + radius) // cell_size)
+        min_y, max_y = int((y - radius) // cell_size), int((y + radius) // cell_size)
+
+        found = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if bucket:
+                    for item, item_x, item_y in bucket:
+                        dx, dy = item_x - x, item_y - y
+                        if dx * dx + dy * dy <= radius_squared:
+                            found.append(item)
+        return found
+
+    def query_neighbors(self, pos, radius, limit):
+        """Up to limit (item, x, y) entries within radius of pos, the search stops once limit are found"""
+        x, y = pos
+        radius_squared = radius * radius
+        cell_size = self.cell_size
+        min_x, max_x = int((x - radius) // cell_size), int((x + radius) // cell_size)
+        min_y, max_y = int((y - radius) // cell_size), int((y + radius) // cell_size)
+
+        found = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if bucket:
+                    for entry in bucket:
+                        dx, dy = entry[1] - x, entry[2] - y
+                        if dx * dx + dy * dy <= radius_squared:
+                            found.append(entry)
+                            if len(found) == limit:
+                                return found
+        return found
+
+    def query_rect(self, rect):
+        """Return the distinct items bucketed in the cells a rect overlaps"""
+        cell_size = self.cell_size
+        found = {}
+        for cell_x in range(rect.left // cell_size, (rect.right - 1) // cell_size + 1):
+            for cell_y in range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if bucket:
+                    for item, _, _ in bucket:
+                        found[item] = None
+        return list(found)
+
+def segment_entry(start, end, rect):
+    """Fraction along start -> end where the segment first enters rect, None if it misses"""
+    entry, leave = 0.0, 1.0
+    for origin, delta, low, high in ((start[0], end[0] - start[0], rect.left, rect.right),
+                                     (start[1], end[1] - start[1], rect.top, rect.bottom)):
+        if delta == 0:
+            # parallel to this pair of edges, it has to start between them
+            if origin < low or origin >= high:
+                return None
+            continue
+        near, far = (low - origin) / delta, (high - origin) / delta
+        if near > far:
+            near, far = far, near
+        entry, leave = max(entry, near), min(leave, far)
+        if entry > leave:
+            return None
+    return entry
+
+def separation(grid, item, pos, radius = CROWD_SEPARATION_RADIUS, limit = CROWD_MAX_NEIGHBORS, key = None):
+    """Push away from at most limit neighbours of item, stronger the closer they are.
+    key orders stacked items so each pair splits the same way every run, without it items are compared directly"""
+    x, y = pos
+    push_x = push_y = 0.0
+    # one extra result, the item usually finds itself
+    for other, other_x, other_y in grid.query_neighbors(pos, radius, limit + 1):
+        if other is item:
+            continue
+        dx, dy = x - other_x, y - other_y
+        distance = hypot(dx, dy)
+        if distance == 0:
+            # exactly stacked, split them along a direction that differs per pair
+            ahead = key(item) > key(other) if key else item > other
+            dx, dy, distance = (1, 0, 1) if ahead else (-1, 0, 1)
+        strength = (radius - distance) / (radius * distance)
+        push_x += dx * strength
+        push_y += dy * strength
+    return push_x, push_y
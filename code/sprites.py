@@ -1,80 +1,79 @@
 from settings import * 
 from math import atan2, degrees
-
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except AttributeError:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+from itertools import count
+from operator import attrgetter
+from random import randrange
+from assets import assets
+from spatial import separation
 
 class Sprite(pygame.sprite.Sprite):
     def __init__(self, pos, surf, groups):
-        super().__init__(groups)
+        # image, rect and flags are set before joining the groups, AllSprites sorts on add
         self.image = surf
         self.rect = self.image.get_rect(topleft = pos)
         self.ground = True
+        super().__init__(groups)
 
 class CollisionSprite(pygame.sprite.Sprite):
     def __init__(self, pos, surf, groups):
-        super().__init__(groups)
         self.image = surf
         self.rect = self.image.get_rect(topleft = pos)
+        self.static = True
+        super().__init__(groups)
 
 class Gun(pygame.sprite.Sprite):
+    rotate_image = True
+
     def __init__(self, player, groups):
         # player connection 
         self.player = player 
         self.distance = 140
         self.player_direction = pygame.Vector2(0,1)
+        self.angle, self.flip = 0, False
 
         # sprite setup 
         super().__init__(groups)
-        self.gun_surf = pygame.image.load(resource_path(join('images', 'gun', 'gun.png'))).convert_alpha()
+        self.gun_surf = assets.image(join('images', 'gun', 'gun.png'), group = 'player', per_pixel = True)
         self.image = self.gun_surf
         self.rect = self.image.get_rect(center = self.player.rect.center + self.player_direction * self.distance)
     
     def get_direction(self):
-        mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
+        mouse_pos = pygame.Vector2(self.player.controls.aim_pos())
         player_pos = pygame.Vector2(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2)
         self.player_direction = (mouse_pos - player_pos).normalize()
 
     def rotate_gun(self):
-        angle = degrees(atan2(self.player_direction.x, self.player_direction.y)) - 90
-        if self.player_direction.x > 0:
-            self.image = pygame.transform.rotozoom(self.gun_surf, angle, 1)
-        else:
-            self.image = pygame.transform.rotozoom(self.gun_surf, abs(angle), 1)
-            self.image = pygame.transform.flip(self.image, False, True)
+        self.angle = degrees(atan2(self.player_direction.x, self.player_direction.y)) - 90
+        self.flip = self.player_direction.x <= 0
+        # a TextureRenderer rotates gun_surf itself, see render.py
+        self.image = self.rotated_image() if self.rotate_image else self.gun_surf
+
+    def rotated_image(self):
+        if not self.flip:
+            return pygame.transform.rotozoom(self.gun_surf, self.angle, 1)
+        image = pygame.transform.rotozoom(self.gun_surf, abs(self.angle), 1)
+        return pygame.transform.flip(image, False, True)
 
     def update(self, _):
         self.get_direction()
         self.rotate_gun()
         self.rect.center = self.player.rect.center + self.player_direction * self.distance
 
-class Bullet(pygame.sprite.Sprite):
-    def __init__(self, surf, pos, direction, groups):
-        super().__init__(groups)
-        self.image = surf 
-        self.rect = self.image.get_rect(center = pos)
-        self.spawn_time = pygame.time.get_ticks()
-        self.lifetime = BULLET_LIFETIME
-
-        self.direction = direction 
-        self.speed = BULLET_SPEED 
-    
-    def update(self, dt):
-        self.rect.center += self.direction * self.speed * dt
-
-        if pygame.time.get_ticks() - self.spawn_time >= self.lifetime:
-            self.kill()
-
 class Enemy(pygame.sprite.Sprite):
-    def __init__(self, pos, frames, groups, player, collision_sprites):
+    # spawn order, breaks separation ties the same way in every run
+    spawn_counter = count()
+    spawn_key = attrgetter('spawn_index')
+
+    def __init__(self, pos, kind, frames, groups, player, collision_sprites, collision_grid, effects, enemy_grid = None):
         super().__init__(groups)
         self.player = player
+        self.effects = effects
+        # last tick's enemy positions, for crowd separation
+        self.enemy_grid = enemy_grid
+        self.spawn_index = next(Enemy.spawn_counter)
 
         # image 
+        self.kind = kind
         self.frames, self.frame_index = frames, 0 
         self.image = self.frames[self.frame_index]
         self.animation_speed = 6
@@ -83,23 +82,42 @@ class Enemy(pygame.sprite.Sprite):
         self.rect = self.image.get_rect(center = pos)
         self.hitbox_rect = self.rect.inflate(-20,-40)
         self.collision_sprites = collision_sprites
+        self.collision_grid = collision_grid
         self.direction = pygame.Vector2()
         self.speed = ENEMY_SPEED
 
-        # timer 
-        self.death_time = 0
-        self.death_duration = 400
+        # level of detail, full updates until the first tier assignment
+        self.lod_tier = 0
+        self.lod_due = True
+        self.lod_phase = randrange(LOD_UPDATE_INTERVALS[-1])
+        self.lod_dt = 0
+
+        # set when an AI worker process owns the movement
+        self.remote = False
+
         self.is_dying = False
     
     def animate(self, dt):
         self.frame_index += self.animation_speed * dt
         self.image = self.frames[int(self.frame_index) % len(self.frames)]
 
-    def move(self, dt):
-        # get direction 
+    def steer(self):
+        """Seek the player, pushed apart from the closest neighbours"""
         player_pos = pygame.Vector2(self.player.rect.center)
         enemy_pos = pygame.Vector2(self.rect.center)
-        self.direction = (player_pos - enemy_pos).normalize()
+        direction = (player_pos - enemy_pos).normalize()
+        if self.enemy_grid is not None:
+            push_x, push_y = separation(self.enemy_grid, self, self.rect.center, key = Enemy.spawn_key)
+            if push_x or push_y:
+                direction.x += push_x * CROWD_SEPARATION_WEIGHT
+                direction.y += push_y * CROWD_SEPARATION_WEIGHT
+                if direction:
+                    direction.normalize_ip()
+        return direction
+
+    def move(self, dt):
+        # get direction 
+        self.direction = self.steer()
 
         # update the rect position + collision
         self.hitbox_rect.x += self.direction.x * self.speed * dt
@@ -118,23 +136,47 @@ class Enemy(pygame.sprite.Sprite):
                     if self.direction.y < 0: self.hitbox_rect.top = sprite.rect.bottom
                     if self.direction.y > 0: self.hitbox_rect.bottom = sprite.rect.top
 
+    def move_coarse(self, dt):
+        """Off-screen movement: one diagonal step resolved against nearby colliders only"""
+        self.direction = self.steer()
+
+        self.hitbox_rect.x += self.direction.x * self.speed * dt
+        self.hitbox_rect.y += self.direction.y * self.speed * dt
+        for sprite in self.collision_grid.query_rect(self.hitbox_rect):
+            if sprite.rect.colliderect(self.hitbox_rect):
+                clip = sprite.rect.clip(self.hitbox_rect)
+                # push out along the axis of least overlap
+                if clip.width < clip.height:
+                    if self.hitbox_rect.centerx < sprite.rect.centerx: self.hitbox_rect.right = sprite.rect.left
+                    else: self.hitbox_rect.left = sprite.rect.right
+                else:
+                    if self.hitbox_rect.centery < sprite.rect.centery: self.hitbox_rect.bottom = sprite.rect.top
+                    else: self.hitbox_rect.top = sprite.rect.bottom
+        self.rect.center = self.hitbox_rect.center
+
     def destroy(self):
         if not self.is_dying:
             self.is_dying = True
-            self.death_time = pygame.time.get_ticks()
-            surf = pygame.mask.from_surface(self.frames[0]).to_surface()
-            surf.set_colorkey('black')
-            self.image = surf
+
+            # the silhouette frames were built at load time, the enemy itself is gone
+            self.effects.spawn(f'{self.kind}_death', self.rect.center)
+            self.kill()
             return True
         return False
-    
-    def death_timer(self):
-        if pygame.time.get_ticks() - self.death_time >= self.death_duration:
-            self.kill()
 
     def update(self, dt):
-        if self.death_time == 0:
-            self.move(dt)
+        if self.is_dying:
+            return
+
+        # reduced-rate tiers catch up with the time they skipped
+        self.lod_dt += dt
+        if not self.lod_due:
+            return
+        dt, self.lod_dt = self.lod_dt, 0
+
+        if self.lod_tier == 0:
+            if not self.remote:
+                self.move(dt)
             self.animate(dt)
-        else:
-            self.death_timer()
\ No newline at end of file
+        elif not self.remote:
+            self.move_coarse(dt)
\ No newline at end of file
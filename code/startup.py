@@ -0,0 +1,28 @@
+from time import perf_counter
+
+# main.py imports this first, so the clock starts before pygame and the game modules load
+LAUNCHED = perf_counter()
+
+class StartupLog:
+    """Times the phases between launch and the first menu frame, and what is loaded after it"""
+    def __init__(self):
+        self.last = LAUNCHED
+        self.phases = []
+
+    def mark(self, phase):
+        """Close the current phase under this name"""
+        now = perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self, milestone, target = None):
+        """Print the phases since the last report and the time since launch"""
+        elapsed = (self.last - LAUNCHED) * 1000
+        phases = ', '.join(f'{phase} {time:.0f} ms' for phase, time in self.phases)
+        verdict = ''
+        if target is not None:
+            verdict = f' (target {target} ms{", missed" if elapsed > target else ""})'
+        print(f'Startup: {milestone} after {elapsed:.0f} ms{verdict}: {phases}')
+        self.phases.clear()
+
+startup = StartupLog()
@@ -0,0 +1,285 @@
+from settings import *
+from sprites import Sprite, CollisionSprite
+from entities import Collider
+from assets import assets
+from array import array
+from base64 import b64decode
+from bisect import bisect_right
+from xml.etree import ElementTree
+import gzip, queue, threading, zlib
+
+# Tiled stores flip flags in the top bits of every gid
+GID_FLIP_HORIZONTAL = 0x80000000
+GID_FLIP_VERTICAL = 0x40000000
+GID_MASK = 0x0FFFFFFF
+
+# rough cost of one tile sprite (object, dict and rect), used for the memory budget
+SPRITE_BYTES = 512
+
+def decode_gids(text, encoding, compression):
+    """Decode the text of a <data> or <chunk> element into an array of gids"""
+    if encoding == 'csv':
+        return array('I', (int(value) for value in text.split(',') if value.strip()))
+    if encoding == 'base64':
+        data = b64decode(text.strip())
+        if compression == 'zlib':
+            data = zlib.decompress(data)
+        elif compression == 'gzip':
+            data = gzip.decompress(data)
+        elif compression:
+            raise ValueError(f'Unsupported layer compression: {compression}')
+        gids = array('I')
+        gids.frombytes(data)
+        if sys.byteorder == 'big':
+            gids.byteswap()
+        return gids
+    raise ValueError(f'Unsupported layer encoding: {encoding}')
+
+def is_infinite(path):
+    """Read the map element only, without parsing the layers"""
+    for _, element in ElementTree.iterparse(path, events = ('start',)):
+        return element.get('infinite') == '1'
+
+class MapObject:
+    __slots__ = ('name', 'x', 'y', 'width', 'height', 'gid')
+
+    def __init__(self, element):
+        self.name = element.get('name', '')
+        self.x, self.y = float(element.get('x', 0)), float(element.get('y', 0))
+        self.width, self.height = float(element.get('width', 0)), float(element.get('height', 0))
+        self.gid = int(element.get('gid', 0))
+        # tile objects are anchored at their bottom left corner
+        if self.gid:
+            self.y -= self.height
+
+class TmxChunkSource:
+    """Minimal TMX reader that keeps tile data encoded until a chunk is asked for"""
+    def __init__(self, path, layer_name = 'Ground', chunk_size = STREAM_CHUNK_SIZE):
+        root = ElementTree.parse(path).getroot()
+        self.folder = os.path.dirname(path)
+        self.tile_size = int(root.get('tilewidth'))
+        self.infinite = root.get('infinite') == '1'
+        self.chunk_size = chunk_size
+
+        self.tilesets = [self.read_tileset(node) for node in root.findall('tileset')]
+        self.tilesets.sort(key = lambda tileset: tileset['firstgid'])
+        self.firstgids = [tileset['firstgid'] for tileset in self.tilesets]
+
+        # chunk key -> encoded tile data, decoded later on the loader thread
+        self.chunks = {}
+        layer = next(node for node in root.findall('layer') if node.get('name') == layer_name)
+        data = layer.find('data')
+        encoding, compression = data.get('encoding'), data.get('compression')
+        if self.infinite:
+            # infinite maps come chunked already, their chunk size wins
+            for chunk in data.findall('chunk'):
+                x, y = int(chunk.get('x')), int(chunk.get('y'))
+                width, height = int(chunk.get('width')), int(chunk.get('height'))
+                self.chunk_size = width
+                self.chunks[(x // width, y // height)] = (chunk.text, encoding, compression, x, y, width, height)
+        else:
+            width, height = int(layer.get('width')), int(layer.get('height'))
+            self.layer_width = width
+            self.gids = decode_gids(data.text, encoding, compression)
+            for chunk_y in range(-(-height // chunk_size)):
+                for chunk_x in range(-(-width // chunk_size)):
+                    x, y = chunk_x * chunk_size, chunk_y * chunk_size
+                    self.chunks[(chunk_x, chunk_y)] = (None, None, None, x, y, min(chunk_size, width - x), min(chunk_size, height - y))
+
+        # object layers are small, keep them parsed and bucket them by every chunk they overlap
+        self.objects = {group.get('name'): [MapObject(node) for node in group.findall('object')] for group in root.findall('objectgroup')}
+        self.chunk_objects = {}
+        chunk_pixels = self.chunk_size * self.tile_size
+        for layer_name in ('Objects', 'Collisions'):
+            for obj in self.objects.get(layer_name, []):
+                left, top = int(obj.x // chunk_pixels), int(obj.y // chunk_pixels)
+                right, bottom = int((obj.x + max(obj.width, 1) - 1) // chunk_pixels), int((obj.y + max(obj.height, 1) - 1) // chunk_pixels)
+                for chunk_x in range(left, right + 1):
+                    for chunk_y in range(top, bottom + 1):
+                        self.chunk_objects.setdefault((chunk_x, chunk_y), []).append((layer_name, obj))
+
+    def read_tileset(self, node):
+        firstgid = int(node.get('firstgid'))
+        folder = self.folder
+        if node.get('source'):
+            path = os.path.join(self.folder, node.get('source'))
+            folder = os.path.dirname(path)
+            node = ElementTree.parse(path).getroot()
+
+        tileset = {
+            'firstgid': firstgid,
+            'tile_width': int(node.get('tilewidth')),
+            'tile_height': int(node.get('tileheight')),
+            'columns': int(node.get('columns', 0)),
+            'margin': int(node.get('margin', 0)),
+            'spacing': int(node.get('spacing', 0)),
+            'image': None,
+            'tiles': {}
+        }
+        image = node.find('image')
+        if image is not None:
+            tileset['image'] = os.path.normpath(os.path.join(folder, image.get('source')))
+        for tile in node.findall('tile'):
+            tile_image = tile.find('image')
+            if tile_image is not None:
+                tileset['tiles'][int(tile.get('id'))] = os.path.normpath(os.path.join(folder, tile_image.get('source')))
+        return tileset
+
+    def tileset_for(self, gid):
+        return self.tilesets[bisect_right(self.firstgids, gid & GID_MASK) - 1]
+
+    def decode_chunk(self, key):
+        """Tile coordinates and gids of every non-empty tile in a chunk, safe to call off the main thread"""
+        text, encoding, compression, x, y, width, height = self.chunks[key]
+        tiles = []
+        if text is not None:
+            gids = decode_gids(text, encoding, compression)
+            for index, gid in enumerate(gids):
+                if gid:
+                    tiles.append((x + index % width, y + index // width, gid))
+        else:
+            for row in range(y, y + height):
+                start = row * self.layer_width
+                for column in range(x, x + width):
+                    gid = self.gids[start + column]
+                    if gid:
+                        tiles.append((column, row, gid))
+        return tiles
+
+class WorldStreamer:
+    """Keeps a ring of map chunks loaded around the player, decoding them on a background thread"""
+    def __init__(self, path, all_sprites, collision_sprites, collision_grid):
+        self.source = TmxChunkSource(path)
+        self.all_sprites = all_sprites
+        self.collision_sprites = collision_sprites
+        self.collision_grid = collision_grid
+
+        # tile images are shared by every chunk and only cut once per gid
+        self.tile_images = {}
+
+        # chunk key -> (tile sprites, objects), objects are refcounted across the chunks they overlap
+        self.loaded = {}
+        self.live_objects = {}
+        self.pending = set()
+        self.memory_used = 0
+
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target = self.load_chunks, daemon = True)
+        self.thread.start()
+
+    def load_chunks(self):
+        while True:
+            key = self.requests.get()
+            if key is None:
+                break
+            self.results.put((key, self.source.decode_chunk(key)))
+
+    def tile_image(self, gid):
+        """Surface for a gid, flipped if its flags ask for it, main thread only"""
+        image = self.tile_images.get(gid)
+        if image is None:
+            tileset = self.source.tileset_for(gid)
+            local_id = (gid & GID_MASK) - tileset['firstgid']
+            if local_id in tileset['tiles']:
+                image = assets.image(tileset['tiles'][local_id], group = 'tiles')
+            else:
+                sheet = assets.image(tileset['image'], group = 'tiles')
+                width, height = tileset['tile_width'], tileset['tile_height']
+                margin, spacing = tileset['margin'], tileset['spacing']
+                column, row = local_id % tileset['columns'], local_id // tileset['columns']
+                image = assets.optimize(sheet.subsurface((margin + column * (width + spacing), margin + row * (height + spacing), width, height)), 'tiles')
+            if gid & (GID_FLIP_HORIZONTAL | GID_FLIP_VERTICAL):
+                image = assets.flipped(image, bool(gid & GID_FLIP_HORIZONTAL), bool(gid & GID_FLIP_VERTICAL), group = 'tiles')
+            self.tile_images[gid] = image
+        return image
+
+    def chunk_at(self, pos):
+        chunk_pixels = self.source.chunk_size * self.source.tile_size
+        return int(pos[0] // chunk_pixels), int(pos[1] // chunk_pixels)
+
+    def distance(self, key, center):
+        return max(abs(key[0] - center[0]), abs(key[1] - center[1]))
+
+    def update(self, pos, block = False):
+        """Request the ring around pos, integrate finished chunks and unload distant ones"""
+        center = self.chunk_at(pos)
+        wanted = [(center[0] + dx, center[1] + dy)
+                  for dx in range(-STREAM_RADIUS, STREAM_RADIUS + 1)
+                  for dy in range(-STREAM_RADIUS, STREAM_RADIUS + 1)]
+        wanted = sorted((key for key in wanted if key in self.source.chunks), key = lambda key: self.distance(key, center))
+        for key in wanted:
+            if key not in self.loaded and key not in self.pending:
+                self.pending.add(key)
+                self.requests.put(key)
+
+        # building sprites is main-thread work, spread it over frames unless the caller must wait
+        integrated = 0
+        while self.pending if block else integrated < STREAM_INTEGRATE_PER_FRAME:
+            try:
+                key, tiles = self.results.get(block = block)
+            except queue.Empty:
+                break
+            self.pending.discard(key)
+            if self.distance(key, center) <= STREAM_RADIUS + 1:
+                self.integrate(key, tiles)
+                integrated += 1
+
+        # one chunk of hysteresis so walking along a border does not thrash
+        for key in list(self.loaded):
+            if self.distance(key, center) > STREAM_RADIUS + 1:
+                self.unload(key)
+
+        # over budget: drop the farthest chunks outside the ring first
+        if self.memory_used > STREAM_MEMORY_BUDGET:
+            wanted = set(wanted)
+            for key in sorted(self.loaded, key = lambda key: -self.distance(key, center)):
+                if self.memory_used <= STREAM_MEMORY_BUDGET or key in wanted:
+                    break
+                self.unload(key)
+
+    def integrate(self, key, tiles):
+        tile_size = self.source.tile_size
+        sprites = [Sprite((x * tile_size, y * tile_size), self.tile_image(gid), self.all_sprites) for x, y, gid in tiles]
+        objects = self.source.chunk_objects.get(key, [])
+        for layer_name, obj in objects:
+            self.acquire(layer_name, obj)
+        self.loaded[key] = (sprites, objects)
+        self.memory_used += len(sprites) * SPRITE_BYTES
+
+    def unload(self, key):
+        sprites, objects = self.loaded.pop(key)
+        for sprite in sprites:
+            sprite.kill()
+        for _, obj in objects:
+            self.release(obj)
+        self.memory_used -= len(sprites) * SPRITE_BYTES
+
+    def acquire(self, layer_name, obj):
+        entry = self.live_objects.get(obj)
+        if entry:
+            entry[1] += 1
+            return
+        if layer_name == 'Objects':
+            collider = CollisionSprite((obj.x, obj.y), self.tile_image(obj.gid), self.all_sprites)
+            self.memory_used += SPRITE_BYTES
+        else:
+            collider = Collider(pygame.Rect(obj.x, obj.y, obj.width, obj.height))
+        self.collision_sprites.append(collider)
+        self.collision_grid.insert_rect(collider, collider.rect)
+        self.live_objects[obj] = [collider, 1]
+
+    def release(self, obj):
+        entry = self.live_objects[obj]
+        entry[1] -= 1
+        if entry[1] == 0:
+            collider = entry[0]
+            del self.live_objects[obj]
+            self.collision_sprites.remove(collider)
+            self.collision_grid.remove_rect(collider, collider.rect)
+            if isinstance(collider, CollisionSprite):
+                collider.kill()
+                self.memory_used -= SPRITE_BYTES
+
+    def close(self):
+        self.requests.put(None)
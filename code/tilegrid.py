@@ -0,0 +1,122 @@
+from settings import *
+from array import array
+from math import floor
+
+class TileGrid:
+    """Ground gids, walkability and enemy occupancy of the map in flat row-major arrays"""
+    def __init__(self, width, height, tile_size = TILE_SIZE):
+        self.width, self.height = width, height
+        self.tile_size = tile_size
+
+        self.gids = array('I', [0]) * (width * height)
+        self.walkable = bytearray(b'\x01') * (width * height)
+        self.occupancy = array('H', [0]) * (width * height)
+        self.empty_occupancy = array('H', [0]) * (width * height)
+
+        # counted from these sprites on the first query after invalidate_occupancy, not every tick
+        self.occupancy_sprites = ()
+        self.occupancy_stale = True
+
+    @classmethod
+    def from_tmx(cls, tmx_map, colliders, layer_name = 'Ground'):
+        """Build the grid from a loaded map's ground layer and the collision rects"""
+        grid = cls(tmx_map.width, tmx_map.height, tmx_map.tilewidth)
+        for y, row in enumerate(tmx_map.get_layer_by_name(layer_name).data):
+            for x, gid in enumerate(row):
+                index = y * grid.width + x
+                grid.gids[index] = gid
+                # cells without ground are outside the playable area
+                if not gid:
+                    grid.walkable[index] = 0
+
+        for collider in colliders:
+            grid.block_rect(collider.rect)
+        return grid
+
+    def in_bounds(self, cell_x, cell_y):
+        return 0 <= cell_x < self.width and 0 <= cell_y < self.height
+
+    def cell_at(self, pos):
+        """Cell coordinates containing a world position"""
+        return int(pos[0] // self.tile_size), int(pos[1] // self.tile_size)
+
+    def cell_rect(self, cell_x, cell_y):
+        return pygame.Rect(cell_x * self.tile_size, cell_y * self.tile_size, self.tile_size, self.tile_size)
+
+    def gid(self, cell_x, cell_y):
+        return self.gids[cell_y * self.width + cell_x] if self.in_bounds(cell_x, cell_y) else 0
+
+    def is_walkable(self, cell_x, cell_y):
+        return self.in_bounds(cell_x, cell_y) and self.walkable[cell_y * self.width + cell_x] == 1
+
+    def is_walkable_at(self, pos):
+        return self.is_walkable(*self.cell_at(pos))
+
+    def cells_in_rect(self, rect):
+        """Cells overlapping a world rect, clamped to the map"""
+        left, top = max(0, rect.left // self.tile_size), max(0, rect.top // self.tile_size)
+        right = min(self.width - 1, (rect.right - 1) // self.tile_size)
+        bottom = min(self.height - 1, (rect.bottom - 1) // self.tile_size)
+        return [(cell_x, cell_y) for cell_y in range(top, bottom + 1) for cell_x in range(left, right + 1)]
+
+    def block_rect(self, rect):
+        for cell_x, cell_y in self.cells_in_rect(rect):
+            self.walkable[cell_y * self.width + cell_x] = 0
+
+    def walkable_cells(self, rect):
+        return [cell for cell in self.cells_in_rect(rect) if self.walkable[cell[1] * self.width + cell[0]]]
+
+    def raycast(self, start, end):
+        """Walk the cells from start to end, returns the first blocked cell or None"""
+        size = self.tile_size
+        cell_x, cell_y = self.cell_at(start)
+        end_x, end_y = self.cell_at(end)
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+
+        # distance along the ray, as a fraction of its length, to the next vertical and horizontal cell edge
+        inf = float('inf')
+        next_x = ((cell_x + (step_x > 0)) * size - start[0]) / dx if dx else inf
+        next_y = ((cell_y + (step_y > 0)) * size - start[1]) / dy if dy else inf
+        delta_x = size / abs(dx) if dx else inf
+        delta_y = size / abs(dy) if dy else inf
+
+        for _ in range(abs(end_x - cell_x) + abs(end_y - cell_y) + 1):
+            if not self.is_walkable(cell_x, cell_y):
+                return cell_x, cell_y
+            if next_x < next_y:
+                cell_x += step_x
+                next_x += delta_x
+            else:
+                cell_y += step_y
+                next_y += delta_y
+        return None
+
+    def line_of_sight(self, start, end):
+        return self.raycast(start, end) is None
+
+    def track_occupancy(self, sprites):
+        """Sprites counted by the occupancy queries"""
+        self.occupancy_sprites = sprites
+        self.occupancy_stale = True
+
+    def invalidate_occupancy(self):
+        """The tracked sprites moved, recount on the next query"""
+        self.occupancy_stale = True
+
+    def update_occupancy(self):
+        """Count the tracked sprites per cell from their rect centers, reusing the array"""
+        occupancy = self.occupancy
+        occupancy[:] = self.empty_occupancy
+        size, width = self.tile_size, self.width
+        for sprite in self.occupancy_sprites:
+            cell_x, cell_y = floor(sprite.rect.centerx / size), floor(sprite.rect.centery / size)
+            if 0 <= cell_x < width and 0 <= cell_y < self.height:
+                occupancy[cell_y * width + cell_x] += 1
+
+    def occupancy_in_rect(self, rect):
+        if self.occupancy_stale:
+            self.update_occupancy()
+            self.occupancy_stale = False
+        return sum(self.occupancy[cell_y * self.width + cell_x] for cell_x, cell_y in self.cells_in_rect(rect))
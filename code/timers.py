@@ -0,0 +1,35 @@
+from heapq import heappush, heappop
+from itertools import count
+
+class TimerQueue:
+    """Min-heap of expiry callbacks driven by simulation time in milliseconds"""
+    def __init__(self):
+        self.time = 0
+        self.heap = []
+        self.counter = count()
+
+    def schedule(self, delay, callback):
+        """Call callback once delay ms of simulation time have passed, returns a handle"""
+        # the counter keeps equal expiry times in schedule order and stops callbacks being compared
+        timer = [self.time + delay, next(self.counter), callback]
+        heappush(self.heap, timer)
+        return timer
+
+    def cancel(self, timer):
+        # lazy deletion, the entry is dropped when it reaches the top of the heap
+        timer[2] = None
+
+    def advance(self, ms):
+        """Move simulation time forward and fire every timer that expired"""
+        self.time += ms
+        heap = self.heap
+        while heap and heap[0][0] <= self.time:
+            _, _, callback = heappop(heap)
+            if callback:
+                callback()
+
+    def clear(self):
+        self.heap.clear()
+
+    def __len__(self):
+        return len(self.heap)
@@ -0,0 +1,58 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Folder build: starts faster than overrun.spec because nothing has to be unpacked to a
+# temporary directory on every launch. Ship the whole dist/Overrun folder.
+
+block_cipher = None
+
+a = Analysis(
+    ['code/main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[
+        ('images', 'images'),
+        ('audio', 'audio'),
+        ('fonts', 'fonts'),
+        ('data', 'data'),
+    ],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    win_no_prefer_redirects=False,
+    win_private_assemblies=False,
+    cipher=block_cipher,
+    noarchive=False,
+)
+
+pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='Overrun',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,  # compressed binaries are unpacked in memory on every launch
+    console=False,  # Set to False to hide console window
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon='overrun.ico',  # Your game icon
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='Overrun',
+)